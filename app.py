@@ -2,112 +2,43 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import requests
-import json
-import os
 from datetime import datetime, timedelta
 import pytz
-from sqlalchemy import create_engine, text
-from sqlalchemy.exc import SQLAlchemyError
 
-DATABASE_URL = os.environ.get('DATABASE_URL')
-
-def init_database():
-    if not DATABASE_URL:
-        return False
-    try:
-        engine = create_engine(DATABASE_URL)
-        with engine.connect() as conn:
-            conn.execute(text('''
-                CREATE TABLE IF NOT EXISTS credentials (
-                    id SERIAL PRIMARY KEY,
-                    api_key TEXT NOT NULL,
-                    profile_id TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            '''))
-            conn.execute(text('''
-                CREATE TABLE IF NOT EXISTS dns_logs (
-                    id SERIAL PRIMARY KEY,
-                    profile_id TEXT NOT NULL,
-                    log_data JSONB NOT NULL,
-                    fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    time_range TEXT
-                )
-            '''))
-            conn.execute(text('''
-                CREATE INDEX IF NOT EXISTS idx_logs_profile ON dns_logs(profile_id)
-            '''))
-            conn.commit()
-        return True
-    except SQLAlchemyError as e:
-        st.error(f"Database error: {e}")
-        return False
-
-def save_credentials_db(api_key, profile_id):
-    if not DATABASE_URL:
-        return False
-    try:
-        engine = create_engine(DATABASE_URL)
-        with engine.connect() as conn:
-            conn.execute(text('DELETE FROM credentials'))
-            conn.execute(text(
-                'INSERT INTO credentials (api_key, profile_id) VALUES (:api_key, :profile_id)'
-            ), {'api_key': api_key, 'profile_id': profile_id})
-            conn.commit()
-        return True
-    except SQLAlchemyError:
-        return False
-
-def load_credentials_db():
-    if not DATABASE_URL:
-        return {'api_key': '', 'profile_id': ''}
-    try:
-        engine = create_engine(DATABASE_URL)
-        with engine.connect() as conn:
-            result = conn.execute(text('SELECT api_key, profile_id FROM credentials ORDER BY id DESC LIMIT 1'))
-            row = result.fetchone()
-            if row:
-                return {'api_key': row[0], 'profile_id': row[1]}
-    except SQLAlchemyError:
-        pass
-    return {'api_key': '', 'profile_id': ''}
-
-def save_logs_db(profile_id, logs, time_range):
-    if not DATABASE_URL or not logs:
-        return False
-    try:
-        engine = create_engine(DATABASE_URL)
-        with engine.connect() as conn:
-            conn.execute(text(
-                'DELETE FROM dns_logs WHERE profile_id = :profile_id'
-            ), {'profile_id': profile_id})
-            conn.execute(text(
-                'INSERT INTO dns_logs (profile_id, log_data, time_range) VALUES (:profile_id, :log_data, :time_range)'
-            ), {'profile_id': profile_id, 'log_data': json.dumps(logs), 'time_range': time_range})
-            conn.commit()
-        return True
-    except SQLAlchemyError as e:
-        st.error(f"Error saving logs: {e}")
-        return False
-
-def load_logs_db(profile_id):
-    if not DATABASE_URL:
-        return None, None, None
-    try:
-        engine = create_engine(DATABASE_URL)
-        with engine.connect() as conn:
-            result = conn.execute(text(
-                'SELECT log_data, fetched_at, time_range FROM dns_logs WHERE profile_id = :profile_id ORDER BY fetched_at DESC LIMIT 1'
-            ), {'profile_id': profile_id})
-            row = result.fetchone()
-            if row:
-                return json.loads(row[0]), row[1], row[2]
-    except SQLAlchemyError:
-        pass
-    return None, None, None
+import nextdns_api
+from database import format_log_timestamp, init_database, parse_log_timestamp, save_credentials_db
+from export import EXPORT_FORMATS, export_rows
+from live import RECENT_ROWS, get_tail, hold_tails, merge_minutes, release_tails, tail_snapshot
+from processing import (
+    compact_frame, dataset_fingerprint, localize_logs, logs_to_frame, normalize_logs, process_logs, sorted_rows, time_bounds,
+    time_rows
+)
+from rollups import (
+    SUMMARY_ROLLUPS, bucket_start, build_rollups, empty_rollup, merge_rollups, recent_ticks, trim_rollups, window_head_end,
+    window_rollups
+)
+from search import build_search_index
+from sketches import build_sketches, window_sketches
+from sync import (
+    STORAGE_BACKENDS, SyncBusyError, fetch_profile_logs, load_saved_credentials, load_sync_status, parse_profiles,
+    run_profiles, save_credentials, select_storage, sync_profiles
+)
+from views import (
+    ALL_PROFILES, COMPANIES, EXPLORER_COLUMNS, VIEWS, approximate_view, company_domain_counts, dashboard_view, device_view,
+    explorer_page, explorer_rows, gafam_view, heatmap_view, live_time_series, profiles_view, row_highlights, summary_view,
+    time_view, timeline_bounds
+)
 
-db_initialized = init_database()
+NORMALIZED_CACHE_ENTRIES = 4
+PROCESSED_CACHE_ENTRIES = 8
+VIEW_CACHE_ENTRIES = 16
+VIEW_WIDGET_KEYS = [
+    'forensics_device', 'log_search', 'log_status', 'log_device', 'log_sort', 'log_order', 'log_page_size', 'log_page',
+    'export_columns', 'export_format'
+]
+EXPLORER_PAGE_SIZES = [25, 50, 100, 250, 500]
+FRAME_CACHE_TTL = 3600
+LIVE_REFRESH_SECONDS = 2
 
 st.set_page_config(
     page_title="NextDNS Advanced Analytics",
@@ -116,68 +47,6 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-GAFAM_DOMAINS = {
-    'google': [
-        'google', 'googleapis', 'gstatic', 'youtube', 'googlevideo', 'ggpht', 
-        'googleusercontent', 'gvt1', 'gvt2', 'gvt3', 'doubleclick', 'googlesyndication', 
-        'googleadservices', 'googleanalytics', 'googletag', 'googleoptimize',
-        'gmail', 'goog', 'chromium', 'android', 'blogger', 'blogspot',
-        'firebase', 'firebaseio', 'googlecloud', 'gcr.io', 'withgoogle',
-        'googleplex', 'googlezip', 'gmodules', 'feedburner', 'admob',
-        'crashlytics', 'appspot', 'googledomains', 'google-analytics',
-        'ytimg', 'yt3.ggpht', 'youtu.be', 'youtube-nocookie'
-    ],
-    'apple': [
-        'apple', 'icloud', 'mzstatic', 'apple-cloudkit', 'cdn-apple',
-        'itunes', 'appstore', 'apple.news', 'apple.com', 'aaplimg',
-        'push.apple', 'siri', 'applemusic', 'icloud-content',
-        'me.com', 'mac.com', 'apple-dns', 'swcdn.apple', 'ls.apple',
-        'gs.apple', 'ess.apple', 'configuration.apple', 'certs.apple',
-        'valid.apple', 'ocsp.apple', 'captive.apple', 'airport.apple'
-    ],
-    'meta': [
-        'facebook', 'fbcdn', 'instagram', 'whatsapp', 'fb.com', 'fb.me',
-        'meta', 'messenger', 'fbsbx', 'facebookcorewwwi', 'accountkit',
-        'oculus', 'workplace', 'fbpigeon', 'facebookmail', 'tfbnw',
-        'fburl', 'cdninstagram', 'threads.net', 'ig.me'
-    ],
-    'amazon': [
-        'amazon', 'amazonaws', 'cloudfront', 'alexa', 'prime',
-        'aws', 'awsstatic', 'elasticbeanstalk', 'elasticache',
-        'amazonvideo', 'amazonpay', 'primevideo', 'twitch', 'twitchcdn',
-        'twitchsvc', 'audible', 'goodreads', 'kindle', 'ring.com',
-        'amazon-adsystem', 'amazonwebservices', 'awscdn', 's3.amazonaws',
-        'ec2.amazonaws', 'media-amazon', 'ssl-images-amazon', 'images-amazon',
-        'fls-na.amazon', 'unagi.amazon', 'device-metrics-us.amazon'
-    ],
-    'microsoft': [
-        'microsoft', 'msn', 'bing', 'azure', 'office', 'live', 'outlook',
-        'skype', 'xbox', 'windows', 'msftconnecttest', 'msedge',
-        'microsoftonline', 'office365', 'sharepoint', 'onedrive', 'onenote',
-        'linkedin', 'licdn', 'github', 'githubusercontent', 'githubassets',
-        'npmjs', 'visualstudio', 'vsassets', 'azureedge', 'trafficmanager',
-        'windowsupdate', 'msauth', 'msftauth', 'msftstatic', 'msecnd',
-        'microsoftstore', 'ms-acdc', 'sfx.ms', 'aka.ms', 'gfx.ms',
-        'c.bing', 's.bing', 'login.live', 'login.microsoftonline',
-        'teams', 'skypeforbusiness', 'lync', 'yammer', 'dynamics',
-        'azure-dns', 'msocsp', 'digicert', 'verisign.net'
-    ]
-}
-
-OTHER_TECH_COMPANIES = {
-    'netflix': ['netflix', 'nflximg', 'nflxvideo', 'nflxext', 'nflxso'],
-    'spotify': ['spotify', 'scdn', 'spotifycdn', 'spotilocal'],
-    'tiktok': ['tiktok', 'tiktokcdn', 'bytedance', 'byteoversea', 'muscdn', 'musical.ly'],
-    'twitter/x': ['twitter', 'twimg', 'x.com', 't.co', 'tweetdeck'],
-    'snapchat': ['snapchat', 'snapkit', 'snap.com', 'snapads'],
-    'adobe': ['adobe', 'typekit', 'adobecc', 'behance', 'adobelogin'],
-    'salesforce': ['salesforce', 'force.com', 'salesforceliveagent', 'sfdc'],
-    'oracle': ['oracle', 'oraclecloud', 'eloqua', 'bluekai', 'grapeshot'],
-    'ibm': ['ibm', 'bluemix', 'softlayer'],
-    'cloudflare': ['cloudflare', 'cloudflare-dns', 'cloudflareresolve', 'cf-ipfs'],
-    'akamai': ['akamai', 'akamaized', 'akamaihd', 'akadns', 'edgekey', 'edgesuite'],
-}
-
 TIME_RANGES = {
     'Last 1 hour': timedelta(hours=1),
     'Last 6 hours': timedelta(hours=6),
@@ -192,218 +61,285 @@ TIME_RANGES = {
     'Last 24 months': timedelta(days=730),
 }
 
-CREDENTIALS_FILE = 'nextdns_credentials.json'
+@st.cache_resource(max_entries=NORMALIZED_CACHE_ENTRIES, ttl=FRAME_CACHE_TTL, show_spinner=False)
+def load_normalized_frame(fingerprint, _logs):
+    return normalize_logs(_logs)
+
+@st.cache_resource(max_entries=NORMALIZED_CACHE_ENTRIES, ttl=FRAME_CACHE_TTL, show_spinner=False)
+def load_stored_frame(fingerprint, profile_id, since):
+    return normalize_logs(load_saved_logs(profile_id, since)[0])
+
+@st.cache_resource(max_entries=PROCESSED_CACHE_ENTRIES, ttl=FRAME_CACHE_TTL, show_spinner=False)
+def load_processed_frame(fingerprint, timezone_str, _normalized):
+    return localize_logs(_normalized, timezone_str)
 
-def load_credentials():
+@st.cache_resource(max_entries=NORMALIZED_CACHE_ENTRIES, ttl=FRAME_CACHE_TTL, show_spinner=False)
+def load_rollups(fingerprint, _normalized):
+    return recent_ticks(build_rollups(_normalized))
+
+@st.cache_resource(max_entries=NORMALIZED_CACHE_ENTRIES, ttl=FRAME_CACHE_TTL, show_spinner=False)
+def load_stored_breakdown(fingerprint, profile_id, since):
+    rollups = load_saved_rollups(profile_id, since, ['breakdown'])
+    return None if rollups is None else rollups['breakdown']
+
+@st.cache_resource(max_entries=PROCESSED_CACHE_ENTRIES, ttl=FRAME_CACHE_TTL, show_spinner=False)
+def load_dashboard_view(view_key, _rollups, _frame, cutoff, timezone_str, exact=True):
+    return dashboard_view(_rollups, _frame, cutoff, timezone_str, exact)
+
+@st.cache_resource(max_entries=VIEW_CACHE_ENTRIES, ttl=FRAME_CACHE_TTL, show_spinner=False)
+def load_windowed_rollups(window_key, profile_id, _rollups, _head, cutoff):
+    if cutoff is None:
+        return _rollups
+    if _head is None:
+        _head = normalize_logs(load_saved_logs(profile_id, cutoff, window_head_end(cutoff).to_pydatetime())[0])
+    return window_rollups(_rollups, _head, cutoff)
+
+@st.cache_resource(max_entries=PROCESSED_CACHE_ENTRIES, ttl=FRAME_CACHE_TTL, show_spinner=False)
+def load_profiles_view(view_key, _parts, timezone_str, exact=True):
+    return profiles_view(_parts, timezone_str, exact)
+
+@st.cache_resource(max_entries=NORMALIZED_CACHE_ENTRIES, ttl=FRAME_CACHE_TTL, show_spinner=False)
+def load_day_sketches(fingerprint, profile_id, since, _rollups):
+    if _rollups is not None:
+        return build_sketches(_rollups['breakdown'])
+    return load_saved_sketches(profile_id, since)
+
+@st.cache_resource(max_entries=PROCESSED_CACHE_ENTRIES, ttl=FRAME_CACHE_TTL, show_spinner=False)
+def load_approximate_view(view_key, _view, _parts):
+    return approximate_view(_view, [sketches for part in _parts for sketches in window_sketches(*part)])
+
+@st.cache_resource(max_entries=PROCESSED_CACHE_ENTRIES, ttl=FRAME_CACHE_TTL, show_spinner=False)
+def load_time_view(view_key, _view, min_time, max_time):
+    return time_view(_view, min_time, max_time)
+
+@st.cache_resource(max_entries=PROCESSED_CACHE_ENTRIES, ttl=FRAME_CACHE_TTL, show_spinner=False)
+def load_heatmap_view(view_key, _view):
+    return heatmap_view(_view)
+
+@st.cache_resource(max_entries=VIEW_CACHE_ENTRIES, ttl=FRAME_CACHE_TTL, show_spinner=False)
+def load_device_view(view_key, device, _view):
+    return device_view(_view, device)
+
+@st.cache_resource(max_entries=PROCESSED_CACHE_ENTRIES, ttl=FRAME_CACHE_TTL, show_spinner=False)
+def load_gafam_view(view_key, _view):
+    return gafam_view(_view)
+
+@st.cache_resource(max_entries=NORMALIZED_CACHE_ENTRIES, ttl=FRAME_CACHE_TTL, show_spinner=False)
+def load_search_index(fingerprint, _normalized):
+    return build_search_index(_normalized['domain'])
+
+@st.cache_resource(max_entries=VIEW_CACHE_ENTRIES, ttl=FRAME_CACHE_TTL, show_spinner=False)
+def load_explorer_order(view_key, search_term, status_filter, device_filter, sort_column, descending, _filtered):
+    return sorted_rows(_filtered, sort_column, descending)
+
+@st.cache_resource(max_entries=VIEW_CACHE_ENTRIES, ttl=FRAME_CACHE_TTL, show_spinner=False)
+def load_explorer_rows(view_key, search_term, status_filter, device_filter, _df, _search_index, offset):
+    return explorer_rows(_df, search_term, status_filter, device_filter, _search_index, offset)
+
+def memory_frame(dataset):
+    if dataset['fingerprint'] is None:
+        dataset['fingerprint'] = dataset_fingerprint(dataset['logs'])
+    fingerprint = dataset['fingerprint']
+    return fingerprint, load_normalized_frame(fingerprint, dataset['logs'])
+
+def session_rollups(dataset, fingerprint, normalized):
+    if dataset['rollups'] is not None:
+        return dataset['rollups']
+    return load_rollups(fingerprint, normalized)
+
+def memory_dataset(logs, rollups, rollups_since, time_range):
+    return {
+        'logs': logs, 'fingerprint': None, 'since': None, 'count': len(logs), 'rollups': rollups,
+        'rollups_since': rollups_since, 'time_range': time_range, 'source': 'api', 'fetched_at': None,
+    }
+
+def stored_dataset(storage, profile_id, since, log_count, time_range, source, fetched_at=None):
+    _, _, _, load_saved_rollups, _, _ = STORAGE_BACKENDS[storage]
+    return {
+        'logs': None, 'fingerprint': f"{storage}:{profile_id}:{datetime.now(pytz.UTC).isoformat()}", 'since': since,
+        'count': log_count, 'rollups': load_saved_rollups(profile_id, since, SUMMARY_ROLLUPS), 'rollups_since': since,
+        'time_range': time_range, 'source': source, 'fetched_at': fetched_at,
+    }
+
+def dataset_frame(profile_id, dataset, cutoff):
+    if dataset['logs'] is not None:
+        return memory_frame(dataset)
+    window_start = stored_window_start(dataset['since'], cutoff)
+    frame_key = f"{dataset['fingerprint']}:{window_start.isoformat()}"
+    return frame_key, load_stored_frame(frame_key, profile_id, window_start)
+
+def mode_rollups(profile_id, dataset, rollups, exact):
+    if not exact:
+        return {**rollups, 'breakdown': empty_rollup('breakdown')}
+    if 'breakdown' in rollups:
+        return rollups
+    breakdown = load_stored_breakdown(dataset['fingerprint'], profile_id, dataset['since'])
+    if breakdown is None:
+        st.warning("Could not load the stored breakdown, device and domain lists may be empty")
+        breakdown = empty_rollup('breakdown')
+    return {**rollups, 'breakdown': breakdown}
+
+def dataset_rollup_cutoff(dataset, cutoff):
+    rollup_cutoff = dataset['rollups_since']
+    if cutoff is not None and (rollup_cutoff is None or cutoff > rollup_cutoff):
+        rollup_cutoff = cutoff
+    return rollup_cutoff
+
+def profile_rollups(profile_id, dataset, cutoff, exact=True):
+    rollup_cutoff = dataset_rollup_cutoff(dataset, cutoff)
+    if dataset['logs'] is not None:
+        frame_key, normalized = memory_frame(dataset)
+        rollups, head = session_rollups(dataset, frame_key, normalized), normalized
+    else:
+        frame_key, rollups, head = dataset['fingerprint'], dataset['rollups'], None
+    window_key = f"{frame_key}:{rollup_cutoff}:{'exact' if exact else 'approximate'}"
+    rollups = mode_rollups(profile_id, dataset, rollups, exact)
+    return window_key, load_windowed_rollups(window_key, profile_id, rollups, head, rollup_cutoff)
+
+def dataset_sketches(profile_id, dataset):
+    if dataset['logs'] is not None:
+        frame_key, normalized = memory_frame(dataset)
+        return load_day_sketches(frame_key, profile_id, None, session_rollups(dataset, frame_key, normalized))
+    return load_day_sketches(dataset['fingerprint'], profile_id, dataset['since'], None)
+
+def profile_sketches(profile_datasets):
+    day_sketches = [dataset_sketches(profile_id, dataset) for profile_id, dataset in profile_datasets]
+    if any(sketches is None for sketches in day_sketches):
+        st.warning("Could not load the stored sketches, showing exact top lists")
+        return None
+    return day_sketches
+
+def time_filter_cutoff(time_filter):
+    if time_filter in TIME_RANGES:
+        return datetime.now(pytz.UTC).replace(second=0, microsecond=0) - TIME_RANGES[time_filter]
+    return None
+
+def stored_window_start(data_since, cutoff):
+    if cutoff is None or cutoff <= data_since:
+        return data_since
+    return max(data_since, bucket_start(cutoff, 'h').to_pydatetime())
+
+def window_rows(df, cutoff):
+    if cutoff is None or 'timestamp' not in df.columns:
+        return 0, len(df)
+    return time_rows(df, cutoff)
+
+def profile_label(profile_id, profiles):
+    return f"{profile_id}: " if len(profiles) > 1 else ""
+
+def request_logs():
+    if all(profile_id in st.session_state.datasets for profile_id in st.session_state.summaries):
+        st.session_state.show_summary = False
+    else:
+        st.session_state.logs_requested = True
+
+def show_kpis(view):
+    col1, col2, col3, col4 = st.columns(4)
+    
+    total_queries = view['total_queries']
+    block_rate = (view['blocked_queries'] / total_queries * 100) if total_queries > 0 else 0
+    
+    device_counts = view['device_counts']
+    top_device = device_counts.index[0] if len(device_counts) > 0 else 'N/A'
+    blocked_domain_counts = view['blocked_domain_counts']
+    top_blocked = blocked_domain_counts.index[0] if len(blocked_domain_counts) > 0 else 'N/A'
+    
+    with col1:
+        st.metric("Total Queries", f"{total_queries:,}")
+    with col2:
+        st.metric("Block Rate", f"{block_rate:.1f}%")
+    with col3:
+        st.metric("Top Device", top_device)
+    with col4:
+        st.metric("Top Blocked", top_blocked)
+
+def keep_live_tails(api_key, profile_ids):
+    keys = {(api_key, profile_id) for profile_id in profile_ids}
+    hold_tails(keys - st.session_state.live_tails)
+    release_tails(st.session_state.live_tails - keys)
+    st.session_state.live_tails = keys
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def show_live(api_key, profile_ids, timezone_str):
+    snapshots = {profile_id: tail_snapshot(get_tail(api_key, profile_id)) for profile_id in profile_ids}
+    started_at = min(snapshot['started_at'] for snapshot in snapshots.values())
+    received = sum(snapshot['received'] for snapshot in snapshots.values())
+    buffered = sum(snapshot['buffered'] for snapshot in snapshots.values())
     try:
-        with open(CREDENTIALS_FILE, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {'api_key': '', 'profile_id': ''}
-
-def save_credentials(api_key, profile_id):
-    with open(CREDENTIALS_FILE, 'w') as f:
-        json.dump({'api_key': api_key, 'profile_id': profile_id}, f)
-
-def classify_gafam(domain):
-    if not domain:
-        return 'Others'
-    domain_lower = domain.lower()
-    for company, patterns in GAFAM_DOMAINS.items():
-        for pattern in patterns:
-            if pattern in domain_lower:
-                return company.capitalize()
-    return 'Others'
-
-def classify_all_tech(domain):
-    if not domain:
-        return 'Others'
-    domain_lower = domain.lower()
-    for company, patterns in GAFAM_DOMAINS.items():
-        for pattern in patterns:
-            if pattern in domain_lower:
-                return company.capitalize()
-    for company, patterns in OTHER_TECH_COMPANIES.items():
-        for pattern in patterns:
-            if pattern in domain_lower:
-                return company.capitalize()
-    return 'Others'
-
-def extract_root_domain(domain):
-    if not domain:
-        return ''
-    parts = domain.split('.')
-    if len(parts) >= 2:
-        return '.'.join(parts[-2:])
-    return domain
-
-@st.cache_data(ttl=300, show_spinner=False)
-def fetch_logs_by_time(api_key, profile_id, from_date, to_date=None):
-    headers = {'X-Api-Key': api_key}
-    base_url = f'https://api.nextdns.io/profiles/{profile_id}/logs'
-    
-    all_logs = []
-    cursor = None
-    
-    while True:
-        params = {'limit': 500}
-        if from_date:
-            params['from'] = from_date.strftime('%Y-%m-%dT%H:%M:%SZ')
-        if to_date:
-            params['to'] = to_date.strftime('%Y-%m-%dT%H:%M:%SZ')
-        if cursor:
-            params['cursor'] = cursor
-        
-        try:
-            response = requests.get(base_url, headers=headers, params=params, timeout=60)
-            if response.status_code == 401:
-                return None, "Invalid API Key"
-            elif response.status_code == 404:
-                return None, "Profile not found"
-            elif response.status_code != 200:
-                return None, f"API Error: {response.status_code}"
-            
-            content_type = response.headers.get('Content-Type', '')
-            
-            if 'application/x-ndjson' in content_type or 'text/event-stream' in content_type:
-                for line in response.text.strip().split('\n'):
-                    if line.strip():
-                        try:
-                            log_entry = json.loads(line)
-                            all_logs.append(log_entry)
-                        except json.JSONDecodeError:
-                            continue
-                break
+        started_at = started_at.tz_convert(timezone_str)
+    except Exception:
+        pass
+    st.caption(f"🔴 Live since {started_at.strftime('%H:%M:%S')} · {received:,} queries received · {buffered:,} in buffer")
+    for profile_id, snapshot in snapshots.items():
+        if snapshot['error']:
+            label = profile_label(profile_id, profile_ids)
+            if snapshot['running']:
+                st.warning(f"{label}{snapshot['error']} - reconnecting...")
             else:
-                try:
-                    data = response.json()
-                except json.JSONDecodeError:
-                    return None, "Invalid response format from API"
-                
-                if isinstance(data, list):
-                    all_logs.extend(data)
-                    break
-                elif isinstance(data, dict):
-                    logs = data.get('data', [])
-                    if not logs:
-                        break
-                    
-                    all_logs.extend(logs)
-                    
-                    meta = data.get('meta', {})
-                    pagination = meta.get('pagination', {})
-                    cursor = pagination.get('cursor')
-                    
-                    if not cursor:
-                        break
-                else:
-                    return None, "Unexpected API response format"
-                
-        except requests.exceptions.Timeout:
-            return None, "Request timeout - try a shorter time range"
-        except requests.exceptions.RequestException as e:
-            return None, f"Connection error: {str(e)}"
+                st.error(f"{label}Live tail stopped: {snapshot['error']}")
     
-    return all_logs, None
-
-@st.cache_data(ttl=300)
-def fetch_analytics(api_key, profile_id, endpoint, params=None):
-    headers = {'X-Api-Key': api_key}
-    url = f'https://api.nextdns.io/profiles/{profile_id}/analytics/{endpoint}'
+    view = dashboard_view(
+        merge_rollups(*[snapshot['rollups'] for snapshot in snapshots.values()]), pd.DataFrame(), None, timezone_str
+    )
+    if not view['total_queries']:
+        st.info("Waiting for new queries...")
+        return
     
-    try:
-        response = requests.get(url, headers=headers, params=params or {}, timeout=30)
-        if response.status_code == 200:
-            return response.json().get('data', []), None
-        return None, f"API Error: {response.status_code}"
-    except Exception as e:
-        return None, str(e)
-
-def process_logs(logs, timezone_str='Europe/Berlin'):
-    if not logs:
-        return pd.DataFrame()
-    
-    df = pd.DataFrame(logs)
-    
-    timestamp_col = None
-    for col in ['timestamp', 'time', 'date', 'ts']:
-        if col in df.columns:
-            timestamp_col = col
-            break
-    
-    if timestamp_col:
-        df['timestamp'] = pd.to_datetime(df[timestamp_col], errors='coerce')
-        try:
-            tz = pytz.timezone(timezone_str)
-            if df['timestamp'].dt.tz is None:
-                df['timestamp'] = df['timestamp'].dt.tz_localize('UTC')
-            df['timestamp'] = df['timestamp'].dt.tz_convert(tz)
-        except Exception:
-            pass
-        df['hour'] = df['timestamp'].dt.hour
-        df['day_of_week'] = df['timestamp'].dt.day_name()
-        df['date'] = df['timestamp'].dt.date
-    else:
-        df['timestamp'] = pd.NaT
-        df['hour'] = 0
-        df['day_of_week'] = 'Unknown'
-        df['date'] = None
+    show_kpis(view)
     
-    if 'status' in df.columns:
-        df['is_blocked'] = df['status'].apply(lambda x: 'Blocked' if str(x).lower() == 'blocked' else 'Allowed')
-    else:
-        df['is_blocked'] = 'Allowed'
-    
-    domain_col = None
-    for col in ['domain', 'name', 'query', 'qname']:
-        if col in df.columns:
-            domain_col = col
-            break
-    
-    if domain_col:
-        df['domain'] = df[domain_col].fillna('')
-        df['root_domain'] = df['domain'].apply(extract_root_domain)
-        df['gafam'] = df['domain'].apply(classify_gafam)
-        df['all_tech'] = df['domain'].apply(classify_all_tech)
-    else:
-        df['domain'] = ''
-        df['root_domain'] = ''
-        df['all_tech'] = 'Others'
-        df['gafam'] = 'Others'
-    
-    if 'device' in df.columns:
-        df['device_name'] = df['device'].apply(
-            lambda x: x.get('name', 'Unknown') if isinstance(x, dict) else (str(x) if x else 'Unknown')
-        )
-    elif 'deviceName' in df.columns:
-        df['device_name'] = df['deviceName'].fillna('Unknown')
-    elif 'client' in df.columns:
-        df['device_name'] = df['client'].apply(
-            lambda x: x.get('name', 'Unknown') if isinstance(x, dict) else (str(x) if x else 'Unknown')
-        )
-    else:
-        df['device_name'] = 'Unknown'
+    st.markdown("---")
     
-    if 'protocol' in df.columns:
-        df['is_encrypted'] = df['protocol'].isin(['DNS-over-HTTPS', 'DNS-over-TLS', 'DOH', 'DOT'])
-    else:
-        df['protocol'] = 'Unknown'
-        df['is_encrypted'] = False
+    st.subheader("Queries per Minute")
+    fig = px.line(
+        live_time_series(merge_minutes(*[snapshot['minutes'] for snapshot in snapshots.values()]), timezone_str),
+        x='time_bucket',
+        y='count',
+        color='is_blocked',
+        color_discrete_map={'Blocked': '#ef4444', 'Allowed': '#22c55e'},
+        labels={'time_bucket': 'Time', 'count': 'Number of Queries', 'is_blocked': 'Status'}
+    )
+    fig.update_layout(
+        template='plotly_dark',
+        hovermode='x unified',
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
+    )
+    st.plotly_chart(fig, use_container_width=True)
     
-    return df
-
-def filter_by_time(df, time_filter):
-    if time_filter == 'All Data' or 'timestamp' not in df.columns:
-        return df
+    col1, col2 = st.columns(2)
     
-    if time_filter in TIME_RANGES:
-        cutoff = datetime.now(pytz.UTC) - TIME_RANGES[time_filter]
-        mask = df['timestamp'] >= cutoff
-        return df[mask]
+    with col1:
+        st.subheader("Activity Heatmap")
+        heatmap_pivot = heatmap_view(view)['heatmap']
+        fig_heatmap = go.Figure(data=go.Heatmap(
+            z=heatmap_pivot.values,
+            x=[f'{h:02d}:00' for h in heatmap_pivot.columns],
+            y=heatmap_pivot.index,
+            colorscale='RdYlGn_r',
+            hoverongaps=False,
+            hovertemplate='Day: %{y}<br>Hour: %{x}<br>Queries: %{z}<extra></extra>'
+        ))
+        fig_heatmap.update_layout(template='plotly_dark', xaxis_title='Hour of Day', yaxis_title='Day of Week', height=400)
+        st.plotly_chart(fig_heatmap, use_container_width=True)
     
-    return df
+    with col2:
+        st.subheader("Latest Queries")
+        recent = sorted(
+            (log for snapshot in snapshots.values() for log in snapshot['recent']),
+            key=lambda log: log.get('timestamp') or '', reverse=True
+        )[:RECENT_ROWS]
+        recent_df = process_logs(logs_to_frame([recent]), timezone_str)
+        page_df = explorer_page(recent_df, range(len(recent_df)), 1, RECENT_ROWS)
+        st.dataframe(page_df.style.apply(row_highlights, axis=None), use_container_width=True, height=400)
+
+db_initialized, db_error = init_database()
+if db_error:
+    st.error(f"Database error: {db_error}")
 
-saved_creds = load_credentials_db() if db_initialized else load_credentials()
+storage = select_storage(db_initialized)
+if storage:
+    _, load_saved_logs, load_log_stats, load_saved_rollups, _, load_saved_sketches = STORAGE_BACKENDS[storage]
+
+saved_creds = load_saved_credentials(db_initialized)
 
 with st.sidebar:
     st.title("🔒 NextDNS Analytics")
@@ -411,21 +347,24 @@ with st.sidebar:
     
     st.subheader("API Configuration")
     api_key = st.text_input("API Key", value=saved_creds.get('api_key', ''), type="password", help="Find your API key at my.nextdns.io/account")
-    profile_id = st.text_input("Profile ID", value=saved_creds.get('profile_id', ''), help="Your NextDNS profile ID (e.g., abc123)")
+    profiles = parse_profiles(st.text_input(
+        "Profile IDs", value=', '.join(saved_creds.get('profiles', [])),
+        help="One or more NextDNS profile IDs, separated by commas (e.g., abc123, def456)"
+    ))
     
     if st.button("💾 Save Credentials", use_container_width=True):
-        if api_key and profile_id:
+        if api_key and profiles:
             if db_initialized:
-                if save_credentials_db(api_key, profile_id):
+                if save_credentials_db(api_key, profiles):
                     st.success("Credentials saved to database!")
                 else:
-                    save_credentials(api_key, profile_id)
+                    save_credentials(api_key, profiles)
                     st.success("Credentials saved locally!")
             else:
-                save_credentials(api_key, profile_id)
+                save_credentials(api_key, profiles)
                 st.success("Credentials saved!")
         else:
-            st.warning("Please enter both API Key and Profile ID")
+            st.warning("Please enter an API Key and at least one Profile ID")
     
     st.markdown("---")
     
@@ -436,65 +375,292 @@ with st.sidebar:
         index=3,
         help="Select how far back to fetch logs"
     )
+    sync_mode = st.radio(
+        "Fetch Mode",
+        ['Incremental', 'Full'],
+        horizontal=True,
+        help="Incremental only fetches logs newer than the latest stored query; Full re-fetches the whole time range"
+    )
     timezone = st.selectbox("Timezone", ['Europe/Berlin', 'Europe/London', 'America/New_York', 'America/Los_Angeles', 'Asia/Tokyo', 'UTC'], index=0)
+    approximate = st.toggle(
+        "≈ Approximate Top Lists", key='approximate_mode',
+        help="Serve top domains and devices and unique counts from per-day sketches instead of exact aggregation; "
+        "faster on long time ranges, counts outside the top entries may be slightly low"
+    )
     
     st.markdown("---")
     
     fetch_button = st.button("📊 Fetch New Data", type="primary", use_container_width=True)
     load_cached_button = st.button("📂 Load Saved Data", use_container_width=True)
+    summary_button = st.button(
+        "⚡ Quick Summary", use_container_width=True,
+        help="KPIs and top domains and devices from the NextDNS analytics API, without downloading logs"
+    )
+    fetch_button = fetch_button or st.session_state.pop('logs_requested', False)
+    live_mode = st.toggle(
+        "🔴 Live Tail", key='live_mode',
+        help="Stream new queries from the NextDNS logs stream; the KPIs, timeline and heatmap update as they arrive"
+    )
+    
+    sync_statuses = {profile_id: load_sync_status(profile_id) for profile_id in profiles} if storage else {}
+    for profile_id, sync_status in sync_statuses.items():
+        if not sync_status:
+            continue
+        label = profile_label(profile_id, profiles)
+        if sync_status['state'] == 'running':
+            sync_from = parse_log_timestamp(sync_status['from_ts']).strftime('%d.%m.%Y %H:%M')
+            st.caption(f"🔄 {label}Sync in progress: {sync_status['rows']:,} logs since {sync_from} UTC fetched, saved once it finishes")
+        elif sync_status['state'] == 'error':
+            st.caption(f"⚠️ {label}Last sync failed, saved logs were left unchanged: {sync_status.get('error')}")
+        if sync_status.get('last_success_at'):
+            last_sync = parse_log_timestamp(sync_status['last_success_at']).strftime('%d.%m.%Y %H:%M')
+            st.caption(f"{label}Last successful sync: {last_sync} UTC")
     
     if st.button("🗑️ Clear Cache", use_container_width=True):
         st.cache_data.clear()
+        load_normalized_frame.clear()
+        load_stored_frame.clear()
+        load_processed_frame.clear()
+        load_rollups.clear()
+        load_search_index.clear()
+        load_windowed_rollups.clear()
+        load_day_sketches.clear()
+        load_stored_breakdown.clear()
+        for view_cache in [
+            load_profiles_view, load_dashboard_view, load_time_view, load_heatmap_view, load_device_view, load_gafam_view,
+            load_explorer_rows, load_explorer_order, load_approximate_view
+        ]:
+            view_cache.clear()
         st.success("Cache cleared!")
 
-if 'logs_data' not in st.session_state:
-    st.session_state.logs_data = None
+if 'datasets' not in st.session_state:
+    st.session_state.datasets = {}
 if 'error' not in st.session_state:
     st.session_state.error = None
-if 'fetch_time_range' not in st.session_state:
-    st.session_state.fetch_time_range = None
+if 'auto_loaded' not in st.session_state:
+    st.session_state.auto_loaded = set()
+if 'summaries' not in st.session_state:
+    st.session_state.summaries = {}
+if 'live_tails' not in st.session_state:
+    st.session_state.live_tails = set()
+if 'show_summary' not in st.session_state:
+    st.session_state.show_summary = False
+if 'log_page_size' not in st.session_state:
+    st.session_state.log_page_size = 100
+for key in VIEW_WIDGET_KEYS:
+    if key in st.session_state:
+        st.session_state[key] = st.session_state[key]
+
+datasets = st.session_state.datasets
 
 if fetch_button:
-    if not api_key or not profile_id:
-        st.error("Please enter both API Key and Profile ID")
+    if not api_key or not profiles:
+        st.error("Please enter an API Key and at least one Profile ID")
     else:
         with st.spinner(f"Fetching logs for {time_range}..."):
-            from_date = datetime.now(pytz.UTC) - TIME_RANGES[time_range]
-            logs, error = fetch_logs_by_time(api_key, profile_id, from_date)
-            if error:
-                st.session_state.error = error
-                st.session_state.logs_data = None
+            to_date = datetime.now(pytz.UTC)
+            from_date = to_date - TIME_RANGES[time_range]
+            if storage:
+                results = sync_profiles(
+                    api_key, profiles, storage, time_range, from_date, to_date, incremental=sync_mode == 'Incremental'
+                )
+            else:
+                previous = {
+                    profile_id: datasets[profile_id]['logs'] for profile_id in profiles
+                    if sync_mode == 'Incremental' and profile_id in datasets
+                }
+                results = run_profiles(
+                    lambda profile_id: fetch_profile_logs(api_key, profile_id, from_date, to_date, previous.get(profile_id)),
+                    profiles
+                )
+            errors = []
+            for profile_id, (result, error) in results.items():
+                label = profile_label(profile_id, profiles)
+                if isinstance(error, SyncBusyError):
+                    st.warning(f"{error}; use \"Load Saved Data\" once it has finished")
+                    continue
+                if error:
+                    datasets.pop(profile_id, None)
+                    errors.append(label + (str(error) if isinstance(error, nextdns_api.FetchError) else f"Error saving logs: {error}"))
+                    continue
+                if storage:
+                    new_count, fetch_from = result
+                    dataset = stored_dataset(storage, profile_id, from_date, load_log_stats(profile_id, from_date)[0], time_range, 'api')
+                else:
+                    new_logs, fetch_from = result
+                    new_count = len(new_logs)
+                    rollups = None
+                    if fetch_from != from_date:
+                        dataset = datasets[profile_id]
+                        rollups = recent_ticks(trim_rollups(merge_rollups(session_rollups(dataset, *memory_frame(dataset)), build_rollups(normalize_logs(new_logs))), from_date))
+                        existing = dataset['logs']
+                        existing = existing[existing['timestamp'] >= format_log_timestamp(from_date)]
+                        new_logs = compact_frame(pd.concat([new_logs, existing], ignore_index=True))
+                    dataset = memory_dataset(new_logs, rollups, from_date if rollups is not None else None, time_range)
+                if dataset['count']:
+                    datasets[profile_id] = dataset
+                    st.session_state.show_summary = False
+                else:
+                    datasets.pop(profile_id, None)
+                if fetch_from != from_date:
+                    st.success(f"{label}Fetched {new_count:,} new logs since {fetch_from.strftime('%d.%m.%Y %H:%M')}")
+                elif storage and new_count:
+                    st.success(f"{label}Fetched {new_count:,} logs and saved to {storage}!")
+            if errors and not datasets:
+                st.session_state.error = '; '.join(errors)
             else:
-                st.session_state.logs_data = logs
                 st.session_state.error = None
-                st.session_state.fetch_time_range = time_range
-                st.session_state.data_source = 'api'
-                if db_initialized and logs:
-                    save_logs_db(profile_id, logs, time_range)
-                    st.success(f"Fetched {len(logs):,} logs and saved to database!")
-
-if load_cached_button:
-    if not profile_id:
-        st.error("Please enter Profile ID to load saved data")
+                for message in errors:
+                    st.error(message)
+
+if summary_button:
+    if not api_key or not profiles:
+        st.error("Please enter an API Key and at least one Profile ID")
     else:
-        with st.spinner("Loading saved data from database..."):
-            logs, fetched_at, saved_time_range = load_logs_db(profile_id)
-            if logs:
-                st.session_state.logs_data = logs
-                st.session_state.error = None
-                st.session_state.fetch_time_range = saved_time_range or 'Unknown'
-                st.session_state.data_source = 'database'
-                st.session_state.fetched_at = fetched_at
-                st.success(f"Loaded {len(logs):,} logs from database (saved: {fetched_at.strftime('%d.%m.%Y %H:%M') if fetched_at else 'Unknown'})")
+        with st.spinner(f"Fetching summary for {time_range}..."):
+            to_date = datetime.now(pytz.UTC)
+            from_date = to_date - TIME_RANGES[time_range]
+            results = run_profiles(
+                lambda profile_id: nextdns_api.fetch_summary(api_key, profile_id, from_date, to_date), profiles
+            )
+            summaries = {profile_id: summary for profile_id, (summary, error) in results.items() if error is None}
+            errors = [
+                f"{profile_label(profile_id, profiles)}{error}" for profile_id, (_, error) in results.items() if error is not None
+            ]
+            if summaries:
+                st.session_state.summaries = summaries
+                st.session_state.summary_range = time_range
+                st.session_state.show_summary = True
+            if errors and not summaries and not datasets:
+                st.session_state.error = '; '.join(errors)
             else:
-                st.warning("No saved data found for this profile. Please fetch new data first.")
+                st.session_state.error = None
+                for message in errors:
+                    st.error(message)
+
+auto_load = [] if fetch_button or summary_button or live_mode or st.session_state.show_summary or st.session_state.error else [
+    profile_id for profile_id, sync_status in sync_statuses.items()
+    if profile_id not in datasets and profile_id not in st.session_state.auto_loaded
+    and sync_status and sync_status.get('last_success_at')
+]
+st.session_state.auto_loaded.update(auto_load)
+
+if load_cached_button or auto_load:
+    if not profiles:
+        st.error("Please enter at least one Profile ID to load saved data")
+    elif not storage:
+        st.warning("No saved data found for this profile. Please fetch new data first.")
+    else:
+        with st.spinner(f"Loading saved data from {storage}..."):
+            since = datetime.now(pytz.UTC) - TIME_RANGES[time_range]
+            for profile_id in profiles if load_cached_button else auto_load:
+                label = profile_label(profile_id, profiles)
+                log_count, fetched_at, _ = load_log_stats(profile_id, since)
+                if log_count:
+                    datasets[profile_id] = stored_dataset(storage, profile_id, since, log_count, time_range, storage, fetched_at)
+                    st.session_state.show_summary = False
+                    st.session_state.error = None
+                    st.success(f"{label}Loaded {log_count:,} logs from {storage} (saved: {fetched_at.strftime('%d.%m.%Y %H:%M') if fetched_at else 'Unknown'})")
+                else:
+                    st.warning(f"{label}No saved data found for this profile. Please fetch new data first.")
+
+if live_mode:
+    st.title("🔒 NextDNS Advanced Analytics")
+    if not api_key or not profiles:
+        keep_live_tails(api_key, [])
+        st.warning("Please enter an API Key and at least one Profile ID to start the live tail")
+        st.stop()
+    live_profile = profiles[0]
+    if len(profiles) > 1:
+        live_profile = st.selectbox(
+            "Profile", [ALL_PROFILES] + profiles, key='live_profile',
+            help="Tail one profile or show the combined counts of all profiles"
+        )
+    live_profiles = profiles if live_profile == ALL_PROFILES else [live_profile]
+    keep_live_tails(api_key, live_profiles)
+    show_live(api_key, live_profiles, timezone)
+    st.stop()
+keep_live_tails(api_key, [])
 
 if st.session_state.error:
     st.error(f"Error: {st.session_state.error}")
     st.info("Please check your API Key and Profile ID")
     st.stop()
 
-if not st.session_state.logs_data:
+if st.session_state.show_summary and st.session_state.summaries:
+    summaries = st.session_state.summaries
+    st.title("🔒 NextDNS Advanced Analytics")
+    st.caption(f"⚡ Quick summary for {st.session_state.summary_range} from the NextDNS analytics API")
+    
+    summary_profile = next(iter(summaries))
+    if len(summaries) > 1:
+        summary_profile = st.selectbox(
+            "Profile", [ALL_PROFILES] + list(summaries), key='summary_profile',
+            help="Show one profile or the combined counts of all summarized profiles"
+        )
+    summary = summary_view(list(summaries.values()) if summary_profile == ALL_PROFILES else [summaries[summary_profile]])
+    
+    show_kpis(summary)
+    
+    st.markdown("---")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("Top Allowed Domains")
+        allowed_domains = summary['allowed_domain_counts']
+        if len(allowed_domains) > 0:
+            fig_allowed = px.bar(
+                x=allowed_domains.values,
+                y=allowed_domains.index,
+                orientation='h',
+                color_discrete_sequence=['#22c55e']
+            )
+            fig_allowed.update_layout(template='plotly_dark', yaxis={'categoryorder': 'total ascending'}, showlegend=False)
+            fig_allowed.update_xaxes(title='Queries')
+            fig_allowed.update_yaxes(title='')
+            st.plotly_chart(fig_allowed, use_container_width=True)
+        else:
+            st.info("No allowed queries found")
+    
+    with col2:
+        st.subheader("Top Blocked Domains")
+        blocked_domains = summary['blocked_domain_counts']
+        if len(blocked_domains) > 0:
+            fig_blocked = px.bar(
+                x=blocked_domains.values,
+                y=blocked_domains.index,
+                orientation='h',
+                color_discrete_sequence=['#ef4444']
+            )
+            fig_blocked.update_layout(template='plotly_dark', yaxis={'categoryorder': 'total ascending'}, showlegend=False)
+            fig_blocked.update_xaxes(title='Queries')
+            fig_blocked.update_yaxes(title='')
+            st.plotly_chart(fig_blocked, use_container_width=True)
+        else:
+            st.info("No blocked queries found")
+    
+    st.subheader("Queries per Device")
+    device_counts = summary['device_counts'].head(15)
+    if len(device_counts) > 0:
+        fig_devices = px.bar(
+            x=device_counts.values,
+            y=device_counts.index,
+            orientation='h',
+            color_discrete_sequence=['#8B5CF6']
+        )
+        fig_devices.update_layout(template='plotly_dark', yaxis={'categoryorder': 'total ascending'}, showlegend=False)
+        fig_devices.update_xaxes(title='Queries')
+        fig_devices.update_yaxes(title='')
+        st.plotly_chart(fig_devices, use_container_width=True)
+    else:
+        st.info("No device data found")
+    
+    st.info("The time analysis, heatmap, device forensics, GAFAM and log explorer views need the raw logs.")
+    st.button("🔎 Load logs for drill-down", type="primary", on_click=request_logs)
+    st.stop()
+
+if not datasets:
     st.title("🔒 NextDNS Advanced Analytics Dashboard")
     st.markdown("""
     ### Welcome! 
@@ -508,23 +674,25 @@ if not st.session_state.logs_data:
     - 🏢 GAFAM (Big Tech) tracking analysis
     - 📋 Full log explorer with search
     - 💾 CSV export
+    - ⚡ Quick summary from the NextDNS analytics API, without downloading logs
     
     **Get Started:**
     1. Enter your **API Key** (find it at [my.nextdns.io/account](https://my.nextdns.io/account))
-    2. Enter your **Profile ID**
+    2. Enter one or more **Profile IDs**
     3. Select a **Time Range**
     4. Click **Fetch Data**
     """)
     st.stop()
 
-df_full = process_logs(st.session_state.logs_data, timezone)
-
-if df_full.empty:
-    st.warning("No log data available")
-    st.stop()
-
 st.title("🔒 NextDNS Advanced Analytics")
 
+selected_profile = next(iter(datasets))
+if len(datasets) > 1:
+    selected_profile = st.selectbox(
+        "Profile", [ALL_PROFILES] + list(datasets), key='active_profile',
+        help="Show one profile or the combined counts of all loaded profiles"
+    )
+
 st.markdown("### 🕐 Filter by Time")
 filter_col1, filter_col2, filter_col3 = st.columns([2, 2, 2])
 
@@ -536,70 +704,75 @@ with filter_col1:
         help="Filter the displayed data by time"
     )
 
-df = filter_by_time(df_full, display_time_filter)
+display_cutoff = time_filter_cutoff(display_time_filter)
+if selected_profile == ALL_PROFILES:
+    df = None
+    day_sketches = profile_sketches(datasets.items()) if approximate else None
+    parts = [
+        profile_rollups(profile_id, dataset, display_cutoff, day_sketches is None) for profile_id, dataset in datasets.items()
+    ]
+    view_key = f"{ALL_PROFILES}:{'|'.join(window_key for window_key, _ in parts)}:{timezone}"
+    view = load_profiles_view(view_key, [rollups for _, rollups in parts], timezone, day_sketches is None)
+    if day_sketches is not None:
+        view_key = f"{view_key}:approximate"
+        view = load_approximate_view(view_key, view, [
+            (sketches, rollups['breakdown'], dataset_rollup_cutoff(dataset, display_cutoff))
+            for sketches, dataset, (_, rollups) in zip(day_sketches, datasets.values(), parts)
+        ])
+    data_count = sum(dataset['count'] for dataset in datasets.values())
+    shown_count = view['total_queries']
+    min_time, max_time = timeline_bounds(view)
+else:
+    dataset = datasets[selected_profile]
+    frame_key, normalized = dataset_frame(selected_profile, dataset, display_cutoff)
+    df_window = load_processed_frame(frame_key, timezone, normalized)
+    window_start_row, window_end_row = window_rows(df_window, display_cutoff)
+    df = df_window.iloc[window_start_row:window_end_row]
+    data_count = dataset['count']
+    shown_count = len(df)
+    min_time, max_time = time_bounds(df)
 
-if df.empty:
-    st.warning("No data for the selected time range")
+if not shown_count:
+    st.warning("No data for the selected time range" if display_cutoff else "No log data available")
     st.stop()
 
 with filter_col2:
-    if 'timestamp' in df.columns and not df['timestamp'].isna().all():
-        min_time = df['timestamp'].min()
-        max_time = df['timestamp'].max()
+    if min_time is not None:
         st.metric("Data Range", f"{min_time.strftime('%d.%m %H:%M')} - {max_time.strftime('%d.%m %H:%M')}")
 
 with filter_col3:
-    st.metric("Filtered Logs", f"{len(df):,} of {len(df_full):,}")
+    st.metric("Filtered Logs", f"{shown_count:,} of {data_count:,}")
 
 st.markdown("---")
 
-col1, col2, col3, col4 = st.columns(4)
-
-total_queries = len(df)
-blocked_count = len(df[df['is_blocked'] == 'Blocked'])
-block_rate = (blocked_count / total_queries * 100) if total_queries > 0 else 0
-
-top_device = df['device_name'].value_counts().index[0] if len(df['device_name'].value_counts()) > 0 else 'N/A'
-blocked_df = df[df['is_blocked'] == 'Blocked']
-top_blocked = blocked_df['root_domain'].value_counts().index[0] if len(blocked_df) > 0 and len(blocked_df['root_domain'].value_counts()) > 0 else 'N/A'
+if df is not None:
+    rollup_cutoff = dataset_rollup_cutoff(dataset, display_cutoff)
+    view_key = f"{frame_key}:{timezone}:{display_cutoff}:{rollup_cutoff}"
+    day_sketches = profile_sketches([(selected_profile, dataset)]) if approximate else None
+    rollups = mode_rollups(selected_profile, dataset, session_rollups(dataset, frame_key, normalized), day_sketches is None)
+    view = load_dashboard_view(view_key, rollups, df_window, rollup_cutoff, timezone, day_sketches is None)
+    if day_sketches is not None:
+        view_key = f"{view_key}:approximate"
+        view = load_approximate_view(view_key, view, [(day_sketches[0], view['head_breakdown'], rollup_cutoff)])
 
-with col1:
-    st.metric("Total Queries", f"{total_queries:,}")
-with col2:
-    st.metric("Block Rate", f"{block_rate:.1f}%")
-with col3:
-    st.metric("Top Device", top_device)
-with col4:
-    st.metric("Top Blocked", top_blocked)
+show_kpis(view)
+if 'unique_domains' in view:
+    st.caption(f"≈ {view['unique_domains']:,} unique root domains · ≈ {view['unique_devices']:,} devices · top lists are approximate")
+total_queries = view['total_queries']
+device_counts = view['device_counts']
 
 st.markdown("---")
 
-tab1, tab2, tab3, tab4, tab5 = st.tabs(["📈 Time Analysis", "🔥 Heatmap", "📱 Device Forensics", "🏢 GAFAM Analysis", "📋 Log Explorer"])
+active_view = st.radio("View", VIEWS, horizontal=True, key='active_view', label_visibility='collapsed')
 
-with tab1:
+if active_view == VIEWS[0]:
     st.subheader("Query Volume Over Time")
     
-    if 'timestamp' in df.columns and not df['timestamp'].isna().all():
-        df_time = df.copy()
-        
-        time_diff = df_time['timestamp'].max() - df_time['timestamp'].min()
-        if time_diff <= timedelta(hours=6):
-            bucket = '5min'
-            df_time['time_bucket'] = df_time['timestamp'].dt.floor('5min')
-        elif time_diff <= timedelta(days=1):
-            bucket = '15min'
-            df_time['time_bucket'] = df_time['timestamp'].dt.floor('15min')
-        elif time_diff <= timedelta(days=3):
-            bucket = 'H'
-            df_time['time_bucket'] = df_time['timestamp'].dt.floor('H')
-        else:
-            bucket = '3H'
-            df_time['time_bucket'] = df_time['timestamp'].dt.floor('3H')
-        
-        time_series = df_time.groupby(['time_bucket', 'is_blocked']).size().reset_index(name='count')
+    if min_time is not None:
+        time_data = load_time_view(view_key, view, min_time, max_time)
         
         fig = px.line(
-            time_series,
+            time_data['time_series'],
             x='time_bucket',
             y='count',
             color='is_blocked',
@@ -618,7 +791,7 @@ with tab1:
         
         with col1:
             st.subheader("Top Allowed Domains")
-            allowed_domains = df[df['is_blocked'] == 'Allowed']['root_domain'].value_counts().head(10)
+            allowed_domains = time_data['allowed_domains']
             if len(allowed_domains) > 0:
                 fig_allowed = px.bar(
                     x=allowed_domains.values,
@@ -635,7 +808,7 @@ with tab1:
         
         with col2:
             st.subheader("Top Blocked Domains")
-            blocked_domains = df[df['is_blocked'] == 'Blocked']['root_domain'].value_counts().head(10)
+            blocked_domains = time_data['blocked_domains']
             if len(blocked_domains) > 0:
                 fig_blocked = px.bar(
                     x=blocked_domains.values,
@@ -652,16 +825,13 @@ with tab1:
     else:
         st.warning("No timestamp data available for time analysis")
 
-with tab2:
+elif active_view == VIEWS[1]:
     st.subheader("Activity Heatmap")
     st.markdown("Identify when your network is most active")
     
-    if 'hour' in df.columns and 'day_of_week' in df.columns:
-        heatmap_data = df.groupby(['day_of_week', 'hour']).size().reset_index(name='count')
-        
-        day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        heatmap_pivot = heatmap_data.pivot(index='day_of_week', columns='hour', values='count').fillna(0)
-        heatmap_pivot = heatmap_pivot.reindex(day_order)
+    if not view['local_timeline'].empty:
+        heatmap = load_heatmap_view(view_key, view)
+        heatmap_pivot = heatmap['heatmap']
         
         fig_heatmap = go.Figure(data=go.Heatmap(
             z=heatmap_pivot.values,
@@ -684,35 +854,29 @@ with tab2:
         col1, col2 = st.columns(2)
         with col1:
             st.subheader("Busiest Hours")
-            hourly_counts = df.groupby('hour').size().sort_values(ascending=False).head(5)
-            for hour, count in hourly_counts.items():
+            for hour, count in heatmap['hourly_counts'].items():
                 st.write(f"**{hour:02d}:00** - {count:,} queries")
         
         with col2:
             st.subheader("Busiest Days")
-            daily_counts = df.groupby('day_of_week').size().reindex(day_order).dropna().sort_values(ascending=False).head(5)
-            for day, count in daily_counts.items():
+            for day, count in heatmap['daily_counts'].items():
                 st.write(f"**{day}** - {int(count):,} queries")
     else:
         st.warning("No time data available for heatmap")
 
-with tab3:
+elif active_view == VIEWS[2]:
     st.subheader("Device Forensics")
     st.markdown("Analyze individual device behavior")
     
-    devices = ['All Devices'] + sorted(df['device_name'].unique().tolist())
-    selected_device = st.selectbox("Select Device", devices)
-    
-    if selected_device == 'All Devices':
-        device_df = df
-    else:
-        device_df = df[df['device_name'] == selected_device]
+    devices = ['All Devices'] + sorted(device_counts.index.tolist())
+    selected_device = st.selectbox("Select Device", devices, key='forensics_device')
+    device = load_device_view(view_key, None if selected_device == 'All Devices' else selected_device, view)
     
-    if len(device_df) > 0:
+    device_total = device['total']
+    if device_total > 0:
         col1, col2, col3 = st.columns(3)
         
-        device_total = len(device_df)
-        device_blocked = len(device_df[device_df['is_blocked'] == 'Blocked'])
+        device_blocked = device['blocked']
         device_block_rate = (device_blocked / device_total * 100) if device_total > 0 else 0
         
         with col1:
@@ -726,7 +890,7 @@ with tab3:
         
         with col1:
             st.subheader("Top Domains")
-            top_domains = device_df['root_domain'].value_counts().head(10)
+            top_domains = device['top_domains']
             if len(top_domains) > 0:
                 fig_domains = px.pie(
                     values=top_domains.values,
@@ -740,9 +904,8 @@ with tab3:
         
         with col2:
             st.subheader("Blocked Domains")
-            device_blocked_df = device_df[device_df['is_blocked'] == 'Blocked']
-            if len(device_blocked_df) > 0:
-                blocked_domains = device_blocked_df['root_domain'].value_counts().head(10)
+            if device_blocked > 0:
+                blocked_domains = device['blocked_domains']
                 fig_blocked = px.bar(
                     x=blocked_domains.values,
                     y=blocked_domains.index,
@@ -756,30 +919,28 @@ with tab3:
             else:
                 st.info("No blocked queries for this device")
         
-        if 'protocol' in device_df.columns:
-            st.subheader("Protocol Distribution")
-            protocol_counts = device_df['protocol'].value_counts()
-            if len(protocol_counts) > 0:
-                fig_protocol = px.pie(
-                    values=protocol_counts.values,
-                    names=protocol_counts.index,
-                    hole=0.4,
-                    color_discrete_sequence=px.colors.qualitative.Set2
-                )
-                fig_protocol.update_layout(template='plotly_dark')
-                st.plotly_chart(fig_protocol, use_container_width=True)
+        st.subheader("Protocol Distribution")
+        protocol_counts = device['protocol_counts']
+        if len(protocol_counts) > 0:
+            fig_protocol = px.pie(
+                values=protocol_counts.values,
+                names=protocol_counts.index,
+                hole=0.4,
+                color_discrete_sequence=px.colors.qualitative.Set2
+            )
+            fig_protocol.update_layout(template='plotly_dark')
+            st.plotly_chart(fig_protocol, use_container_width=True)
     else:
         st.info("No data for selected device")
 
-with tab4:
+elif active_view == VIEWS[3]:
     st.subheader("GAFAM & Big Tech Analysis")
     st.markdown("Detailed breakdown of requests to major tech companies")
     
-    if 'gafam' in df.columns and 'all_tech' in df.columns:
-        gafam_counts = df['gafam'].value_counts()
-        all_tech_counts = df['all_tech'].value_counts()
+    if not view['timeline'].empty:
+        gafam = load_gafam_view(view_key, view)
+        gafam_counts = gafam['gafam_counts']
         
-        total_queries = len(df)
         gafam_total = total_queries - gafam_counts.get('Others', 0)
         gafam_percent = (gafam_total / total_queries * 100) if total_queries > 0 else 0
         
@@ -853,7 +1014,7 @@ with tab4:
             st.plotly_chart(fig_gafam_bar, use_container_width=True)
         
         st.markdown("### Other Tech Companies")
-        other_tech_only = all_tech_counts[~all_tech_counts.index.isin(['Google', 'Apple', 'Meta', 'Amazon', 'Microsoft', 'Others'])]
+        other_tech_only = gafam['other_tech_counts']
         if len(other_tech_only) > 0:
             col1, col2 = st.columns(2)
             with col1:
@@ -879,12 +1040,9 @@ with tab4:
         else:
             st.info("No requests to other tracked tech companies detected")
         
-        if 'timestamp' in df.columns and not df['timestamp'].isna().all():
+        if not view['local_timeline'].empty:
             st.markdown("### GAFAM Requests Over Time")
-            df_gafam_time = df.copy()
-            df_gafam_time['time_bucket'] = df_gafam_time['timestamp'].dt.floor('H')
-            
-            gafam_time_series = df_gafam_time.groupby(['time_bucket', 'gafam']).size().reset_index(name='count')
+            gafam_time_series = gafam['gafam_time_series']
             
             fig_gafam_time = px.area(
                 gafam_time_series,
@@ -908,10 +1066,9 @@ with tab4:
             st.plotly_chart(fig_gafam_time, use_container_width=True)
         
         st.markdown("### Top Domains by Company")
-        for company in ['Google', 'Apple', 'Meta', 'Amazon', 'Microsoft']:
-            company_df = df[df['gafam'] == company]
-            company_domains = company_df['root_domain'].value_counts().head(10)
-            company_count = len(company_df)
+        for company in COMPANIES:
+            company_domains = company_domain_counts(gafam, company).head(10)
+            company_count = int(gafam_counts.get(company, 0))
             company_pct = (company_count / total_queries * 100) if total_queries > 0 else 0
             
             with st.expander(f"{company} - {company_count:,} queries ({company_pct:.1f}%)"):
@@ -926,72 +1083,89 @@ with tab4:
     else:
         st.warning("No GAFAM data available")
 
-with tab5:
+elif df is None:
+    st.subheader("Interactive Log Explorer")
+    st.info("Select a single profile above to browse and export its logs")
+
+else:
     st.subheader("Interactive Log Explorer")
     
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        search_term = st.text_input("🔍 Search domains", "")
+        search_term = st.text_input(
+            "🔍 Search domains", "", key='log_search',
+            help="Matches any part of the domain; use * and ? as wildcards, e.g. ads.* or *.google.com"
+        )
     
     with col2:
-        status_filter = st.selectbox("Status", ['All', 'Allowed', 'Blocked'])
+        status_filter = st.selectbox("Status", ['All', 'Allowed', 'Blocked'], key='log_status')
     
     with col3:
         device_filter = st.selectbox("Device", ['All'] + sorted(df['device_name'].unique().tolist()), key='log_device')
     
-    filtered_df = df.copy()
+    search_index = load_search_index(frame_key, normalized) if search_term else None
+    filtered_df = load_explorer_rows(view_key, search_term, status_filter, device_filter, df, search_index, window_start_row)
+    st.write(f"Showing {len(filtered_df):,} of {len(df):,} logs")
     
-    if search_term and 'domain' in filtered_df.columns:
-        filtered_df = filtered_df[filtered_df['domain'].astype(str).str.contains(search_term, case=False, na=False)]
+    col1, col2, col3, col4 = st.columns(4)
     
-    if status_filter != 'All':
-        filtered_df = filtered_df[filtered_df['is_blocked'] == status_filter]
+    with col1:
+        sort_column = st.selectbox(
+            "Sort by", list(EXPLORER_COLUMNS), format_func=EXPLORER_COLUMNS.get, key='log_sort'
+        )
     
-    if device_filter != 'All':
-        filtered_df = filtered_df[filtered_df['device_name'] == device_filter]
+    with col2:
+        sort_order = st.selectbox("Order", ['Descending', 'Ascending'], key='log_order')
     
-    st.write(f"Showing {len(filtered_df):,} of {len(df):,} logs")
+    with col3:
+        page_size = st.selectbox("Rows per page", EXPLORER_PAGE_SIZES, key='log_page_size')
     
-    display_cols = ['timestamp', 'domain', 'device_name', 'protocol', 'is_blocked']
-    available_cols = [col for col in display_cols if col in filtered_df.columns]
+    page_count = max(1, (len(filtered_df) + page_size - 1) // page_size)
+    if st.session_state.get('log_page', 1) > page_count:
+        st.session_state.log_page = page_count
     
-    if available_cols:
-        display_df = filtered_df[available_cols].copy()
-        display_df.columns = ['Timestamp', 'Domain', 'Device', 'Protocol', 'Status'][:len(available_cols)]
-        
-        def highlight_status(row):
-            if 'Status' in row.index:
-                if row['Status'] == 'Blocked':
-                    return ['background-color: rgba(239, 68, 68, 0.3)'] * len(row)
-            if 'Protocol' in row.index:
-                if row['Protocol'] in ['DNS-over-HTTPS', 'DNS-over-TLS', 'DOH', 'DOT']:
-                    return ['background-color: rgba(34, 197, 94, 0.2)'] * len(row)
-            return [''] * len(row)
-        
-        styled_df = display_df.head(500).style.apply(highlight_status, axis=1)
-        st.dataframe(styled_df, use_container_width=True, height=500)
-        
-        if len(filtered_df) > 500:
-            st.info("Showing first 500 rows. Export to CSV for complete data.")
+    with col4:
+        page = st.number_input(f"Page (of {page_count:,})", min_value=1, max_value=page_count, step=1, key='log_page')
+    
+    order = load_explorer_order(
+        view_key, search_term, status_filter, device_filter, sort_column, sort_order == 'Descending', filtered_df
+    )
+    page_df = explorer_page(filtered_df, order, page, page_size)
+    st.dataframe(page_df.style.apply(row_highlights, axis=None), use_container_width=True, height=500)
+    
+    if len(filtered_df) > 0:
+        first_row = (page - 1) * page_size + 1
+        st.caption(f"Rows {first_row:,}–{first_row + len(page_df) - 1:,} of {len(filtered_df):,}")
     
     st.markdown("---")
     
     st.subheader("💾 Export Data")
     
-    csv = filtered_df.to_csv(index=False)
+    export_col1, export_col2 = st.columns([3, 1])
+    
+    with export_col1:
+        export_columns = st.multiselect(
+            "Columns", list(filtered_df.columns), key='export_columns', placeholder="All columns"
+        )
+    
+    with export_col2:
+        export_format = st.selectbox("Format", list(EXPORT_FORMATS), key='export_format')
+    
+    extension, mime = EXPORT_FORMATS[export_format]
+    export_columns = export_columns or list(filtered_df.columns)
     st.download_button(
-        label="📥 Download CSV",
-        data=csv,
-        file_name=f"nextdns_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-        mime="text/csv",
+        label=f"📥 Download {export_format} ({len(filtered_df):,} rows)",
+        data=lambda: export_rows(filtered_df, order, export_columns, export_format),
+        file_name=f"nextdns_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}",
+        mime=mime,
         use_container_width=True
     )
 
 st.markdown("---")
 st.markdown(
     "<div style='text-align: center; color: #6B7280; font-size: 0.8em;'>"
-    "NextDNS Advanced Analytics Dashboard | Data cached for 5 minutes"
+    "NextDNS Advanced Analytics Dashboard"
     "</div>",
     unsafe_allow_html=True
 )
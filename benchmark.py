@@ -0,0 +1,247 @@
+import argparse
+import random
+import string
+import time
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from processing import (
+    GAFAM_DOMAINS, OTHER_TECH_COMPANIES, classify_domain, classify_domains, logs_to_frame, process_logs, time_bounds,
+    time_slice
+)
+from rollups import build_rollups, coarsen_rollup, heatmap_matrix, localize_rollup, rollup_counts
+from search import build_search_index, search_rows
+from sketches import DISTINCT_SKETCHES, TOP_K_SKETCHES, build_sketches, hll_estimate, merge_sketches
+
+SUFFIXES = ['com', 'net', 'org', 'io', 'de', 'co.uk']
+DEVICES = [{'id': f'D{index}', 'name': f'Device {index}', 'model': 'generic'} for index in range(12)]
+STATUSES = ['default', 'default', 'default', 'blocked', 'allowed']
+PROTOCOLS = ['DNS-over-HTTPS', 'DNS-over-TLS', 'UDP', 'TCP']
+
+def synthetic_domains(rows, distinct=20000, seed=42, skew=None):
+    rng = random.Random(seed)
+    patterns = [pattern for companies in (GAFAM_DOMAINS, OTHER_TECH_COMPANIES) for group in companies.values() for pattern in group]
+    pool = []
+    for _ in range(distinct):
+        label = ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10)))
+        if rng.random() < 0.4:
+            label = f'{label}.{rng.choice(patterns)}'
+        pool.append(f'{label}.{rng.choice(SUFFIXES)}')
+    if skew:
+        return rng.choices(pool, weights=[1 / (rank + 1) ** skew for rank in range(distinct)], k=rows)
+    return [rng.choice(pool) for _ in range(rows)]
+
+def synthetic_logs(rows, seed=42, days=30, skew=None):
+    rng = random.Random(seed)
+    end = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    logs = []
+    for domain in synthetic_domains(rows, seed=seed, skew=skew):
+        timestamp = end - timedelta(seconds=rng.randint(0, days * 86400), milliseconds=rng.randint(0, 999))
+        logs.append({
+            'timestamp': timestamp.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z',
+            'domain': domain,
+            'root': '.'.join(domain.split('.')[-2:]),
+            'encrypted': True,
+            'protocol': rng.choice(PROTOCOLS),
+            'clientIp': f'10.0.0.{rng.randint(1, 50)}',
+            'status': rng.choice(STATUSES),
+            'device': rng.choice(DEVICES),
+        })
+    return logs
+
+def megabytes(frame):
+    return frame.memory_usage(deep=True).sum() / 1e6
+
+def loop_classify_gafam(domain):
+    if not domain:
+        return 'Others'
+    domain_lower = domain.lower()
+    for company, patterns in GAFAM_DOMAINS.items():
+        for pattern in patterns:
+            if pattern in domain_lower:
+                return company.capitalize()
+    return 'Others'
+
+def loop_classify_all_tech(domain):
+    if not domain:
+        return 'Others'
+    domain_lower = domain.lower()
+    for companies in (GAFAM_DOMAINS, OTHER_TECH_COMPANIES):
+        for company, patterns in companies.items():
+            for pattern in patterns:
+                if pattern in domain_lower:
+                    return company.capitalize()
+    return 'Others'
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def bench_classifier(rows):
+    domains = pd.Series(synthetic_domains(rows))
+
+    (loop_gafam, loop_all_tech), loop_seconds = timed(
+        lambda series: (series.apply(loop_classify_gafam), series.apply(loop_classify_all_tech)), domains
+    )
+    classify_domain.cache_clear()
+    (gafam, all_tech), cold_seconds = timed(classify_domains, domains)
+    _, warm_seconds = timed(classify_domains, domains)
+
+    assert (loop_gafam.to_numpy() == gafam).all()
+    assert (loop_all_tech.to_numpy() == all_tech).all()
+
+    print(f'classifier: {rows:,} rows, {domains.nunique():,} distinct domains')
+    print(f'  substring loops (apply x2): {loop_seconds:8.2f}s')
+    print(f'  compiled, cold cache:       {cold_seconds:8.2f}s  ({loop_seconds / cold_seconds:.0f}x)')
+    print(f'  compiled, warm cache:       {warm_seconds:8.2f}s  ({loop_seconds / warm_seconds:.0f}x)')
+
+def bench_process_logs(rows):
+    logs = synthetic_logs(rows)
+
+    frame, frame_seconds = timed(logs_to_frame, [logs[i:i + 5000] for i in range(0, rows, 5000)])
+    classify_domain.cache_clear()
+    df, process_seconds = timed(process_logs, frame, 'Europe/Berlin')
+    as_objects = df.astype({col: object for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)})
+
+    print(f'process_logs: {rows:,} rows')
+    print(f'  batches -> frame:            {frame_seconds:8.2f}s')
+    print(f'  process_logs:                {process_seconds:8.2f}s')
+    print(f'  df_full memory:              {megabytes(df):8.1f} MB  ({megabytes(as_objects):.1f} MB as object columns)')
+
+def raw_chart_aggregates(df):
+    df.groupby(['day_of_week', 'hour'], observed=True).size()
+    df.groupby([df['timestamp'].dt.floor('3h'), 'is_blocked'], observed=True).size()
+    df.groupby([df['timestamp'].dt.floor('15min'), 'is_blocked'], observed=True).size()
+    df['device_name'].value_counts()
+    df[df['is_blocked'] == 'Blocked']['root_domain'].value_counts()
+    for company in ['Google', 'Apple', 'Meta', 'Amazon', 'Microsoft']:
+        df[df['gafam'] == company]['root_domain'].value_counts()
+
+def rollup_chart_aggregates(rollups):
+    timeline = localize_rollup(rollups['timeline'], 'Europe/Berlin')
+    breakdown = rollups['breakdown']
+    heatmap_matrix(timeline)
+    coarsen_rollup(timeline, '3h', ['is_blocked'])
+    coarsen_rollup(localize_rollup(rollups['ticks'], 'Europe/Berlin'), '15min', ['is_blocked'])
+    rollup_counts(breakdown, 'device_name')
+    rollup_counts(breakdown[breakdown['is_blocked'] == 'Blocked'], 'root_domain')
+    for company in ['Google', 'Apple', 'Meta', 'Amazon', 'Microsoft']:
+        rollup_counts(breakdown[breakdown['gafam'] == company], 'root_domain')
+
+def bench_rollups(rows):
+    df = process_logs(logs_to_frame([synthetic_logs(rows)]), 'Europe/Berlin')
+
+    rollups, build_seconds = timed(build_rollups, df)
+    _, raw_seconds = timed(raw_chart_aggregates, df)
+    _, rollup_seconds = timed(rollup_chart_aggregates, rollups)
+
+    print(f'rollups: {rows:,} rows')
+    print(f'  build (once per ingest):     {build_seconds:8.2f}s')
+    for name, table in rollups.items():
+        print(f'  {name + " rows:":28} {len(table):8,}')
+    print(f'  chart aggregates, raw rows:  {raw_seconds:8.2f}s')
+    print(f'  chart aggregates, rollups:   {rollup_seconds:8.2f}s  ({raw_seconds / rollup_seconds:.0f}x)')
+
+def mask_windows(df, cutoffs):
+    for cutoff in cutoffs:
+        window = df[df['timestamp'] >= cutoff]
+        window['timestamp'].min(), window['timestamp'].max()
+
+def slice_windows(df, cutoffs):
+    for cutoff in cutoffs:
+        time_bounds(time_slice(df, cutoff))
+
+def bench_time_slices(rows):
+    df = process_logs(logs_to_frame([synthetic_logs(rows)]), 'Europe/Berlin')
+    end = df['timestamp'].max()
+    cutoffs = [end - timedelta(hours=hours) for hours in (1, 6, 24, 72, 168, 720)] * 10
+
+    _, mask_seconds = timed(mask_windows, df, cutoffs)
+    _, slice_seconds = timed(slice_windows, df, cutoffs)
+
+    print(f'time windows: {rows:,} rows, {len(cutoffs)} windows')
+    print(f'  boolean mask + min/max:      {mask_seconds:8.3f}s')
+    print(f'  searchsorted slice + bounds: {slice_seconds:8.3f}s  ({mask_seconds / slice_seconds:.0f}x)')
+
+SEARCH_TERMS = ['google', 'ads', 'apple.com', 'xq', 'zzzz', 'face', '.co.uk', 'micro']
+
+def contains_search(df, terms):
+    return [df[df['domain'].astype(str).str.contains(term, case=False, regex=False)] for term in terms]
+
+def index_search(df, index, terms):
+    return [df.take(search_rows(index, term)) for term in terms]
+
+def bench_search(rows):
+    df = process_logs(logs_to_frame([synthetic_logs(rows)]), 'Europe/Berlin')
+
+    index, build_seconds = timed(build_search_index, df['domain'])
+    scans, contains_seconds = timed(contains_search, df, SEARCH_TERMS)
+    hits, index_seconds = timed(index_search, df, index, SEARCH_TERMS)
+    globs, glob_seconds = timed(index_search, df, index, ['goo*', '*.net', '*.google.*', 'a?c*'])
+
+    assert all(scan.index.equals(hit.index) for scan, hit in zip(scans, hits))
+
+    print(f'search: {rows:,} rows, {len(index["domains"]):,} distinct domains, {len(SEARCH_TERMS)} terms')
+    print(f'  build index (once per data): {build_seconds:8.3f}s  ({len(index["grams"]):,} trigrams)')
+    print(f'  str.contains over all rows:  {contains_seconds:8.3f}s')
+    print(f'  trigram index:               {index_seconds:8.3f}s  ({contains_seconds / index_seconds:.0f}x)')
+    print(f'  4 glob patterns:             {glob_seconds:8.3f}s  ({sum(len(hit) for hit in globs):,} rows matched)')
+
+def exact_top_lists(breakdown):
+    blocked = breakdown['is_blocked'] == 'Blocked'
+    return {
+        'allowed_domains': rollup_counts(breakdown[~blocked], 'root_domain'),
+        'blocked_domains': rollup_counts(breakdown[blocked], 'root_domain'),
+        'domains': rollup_counts(breakdown, 'root_domain'),
+        'devices': rollup_counts(breakdown, 'device_name'),
+        'blocked_devices': rollup_counts(breakdown[blocked], 'device_name'),
+        'tech': rollup_counts(breakdown, 'all_tech'),
+        'unique_domains': breakdown['root_domain'].nunique(),
+    }
+
+def sketch_top_lists(day_sketches):
+    sketches = merge_sketches(day_sketches.values(), [*TOP_K_SKETCHES, *DISTINCT_SKETCHES])
+    top_lists = {name: sketches[name]['counts'] for name in TOP_K_SKETCHES}
+    top_lists['unique_domains'] = hll_estimate(sketches['unique_domains'])
+    return top_lists
+
+def bench_sketches(rows):
+    df = process_logs(logs_to_frame([synthetic_logs(rows, skew=1.1)]), 'Europe/Berlin')
+    breakdown = build_rollups(df)['breakdown']
+
+    day_sketches, build_seconds = timed(build_sketches, breakdown)
+    exact, exact_seconds = timed(exact_top_lists, breakdown)
+    approximate, sketch_seconds = timed(sketch_top_lists, day_sketches)
+
+    print(f'sketches: {rows:,} rows, {len(day_sketches)} days, {len(breakdown):,} breakdown rows')
+    print(f'  build (once per ingest):     {build_seconds:8.3f}s')
+    print(f'  exact top lists:             {exact_seconds:8.3f}s')
+    print(f'  merged sketches:             {sketch_seconds:8.3f}s  ({exact_seconds / sketch_seconds:.0f}x)')
+    for name in TOP_K_SKETCHES:
+        top = exact[name].head(10)
+        estimates = approximate[name].reindex(top.index, fill_value=0)
+        recall = len(top.index.intersection(approximate[name].head(10).index)) / max(len(top), 1)
+        error = ((estimates - top).abs() / top).max() if len(top) else 0
+        print(f'  {name + " top 10:":28} recall {recall:6.0%}, max count error {error:6.2%}')
+    error = abs(approximate['unique_domains'] - exact['unique_domains']) / max(exact['unique_domains'], 1)
+    print(f'  unique root domains:         {exact["unique_domains"]:,} exact, {approximate["unique_domains"]:,} estimated ({error:.2%})')
+
+BENCHMARKS = {
+    'classifier': bench_classifier,
+    'process_logs': bench_process_logs,
+    'rollups': bench_rollups,
+    'time_slices': bench_time_slices,
+    'search': bench_search,
+    'sketches': bench_sketches,
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks for the NextDNS dashboard data pipeline')
+    parser.add_argument('benchmark', choices=['all'] + list(BENCHMARKS), nargs='?', default='all')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+    for name, bench in BENCHMARKS.items():
+        if args.benchmark in ('all', name):
+            bench(args.rows)
@@ -0,0 +1,598 @@
+import io
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+
+import pandas as pd
+import pytz
+from sqlalchemy import create_engine, inspect, make_url, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from processing import extract_root_domain, logs_to_frame
+from rollups import BREAKDOWN_FREQ, ROLLUPS, bucket_start, merge_rollups, rollups_from_logs, ticks_since, trim_rollups
+from sketches import build_sketches, sketch_rows, sketches_from_rows
+
+DATABASE_URL = os.environ.get('DATABASE_URL')
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '10'))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '1800'))
+DB_BUSY_TIMEOUT = float(os.environ.get('DB_BUSY_TIMEOUT', '30'))
+
+LOG_BATCH_SIZE = 5000
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+ROLLUP_TABLES = {
+    'ticks': 'dns_rollup_ticks', 'timeline': 'dns_rollup_timeline', 'breakdown': 'dns_rollup_breakdown',
+    'protocols': 'dns_rollup_protocols',
+}
+STAGED_ROLLUP_TABLES = {name: table.replace('dns_rollup_', 'dns_staged_rollup_') for name, table in ROLLUP_TABLES.items()}
+LOG_COLUMNS = (
+    'timestamp, domain, root_domain, device_id, device_name, device_model, client_ip, protocol, encrypted, '
+    'status, reasons'
+)
+LOG_ROW_COLUMNS = [
+    'profile_id', 'timestamp', 'domain', 'root_domain', 'device_id', 'device_name', 'device_model', 'client_ip',
+    'protocol', 'encrypted', 'status', 'reasons'
+]
+
+schema_lock = threading.Lock()
+schema_ready = False
+
+def sqlite_database():
+    return bool(DATABASE_URL) and make_url(DATABASE_URL).get_backend_name() == 'sqlite'
+
+@lru_cache(maxsize=None)
+def get_engine():
+    if sqlite_database():
+        return create_engine(DATABASE_URL, pool_pre_ping=True, connect_args={'timeout': DB_BUSY_TIMEOUT})
+    return create_engine(
+        DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+
+def init_database():
+    global schema_ready
+    if not DATABASE_URL:
+        return False, None
+    if schema_ready:
+        return True, None
+    try:
+        with schema_lock:
+            if schema_ready:
+                return True, None
+            create_schema()
+            schema_ready = True
+        return True, None
+    except SQLAlchemyError as e:
+        return False, str(e)
+
+def schema_sql(conn, statement):
+    if conn.dialect.name == 'sqlite':
+        statement = statement.replace('BIGSERIAL PRIMARY KEY', 'INTEGER PRIMARY KEY AUTOINCREMENT')
+        statement = statement.replace('SERIAL PRIMARY KEY', 'INTEGER PRIMARY KEY AUTOINCREMENT')
+    return text(statement)
+
+def uses_psycopg2(conn):
+    return conn.dialect.name == 'postgresql' and conn.dialect.driver == 'psycopg2'
+
+@contextmanager
+def raw_cursor(conn):
+    import psycopg2
+    with conn.connection.cursor() as cursor:
+        try:
+            yield cursor
+        except psycopg2.Error as e:
+            raise SQLAlchemyError(str(e)) from e
+
+def create_schema():
+    with get_engine().connect() as conn:
+        conn.execute(schema_sql(conn, '''
+            CREATE TABLE IF NOT EXISTS credentials (
+                id SERIAL PRIMARY KEY,
+                api_key TEXT NOT NULL,
+                profile_id TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        '''))
+        conn.execute(schema_sql(conn, '''
+            CREATE TABLE IF NOT EXISTS dns_queries (
+                id BIGSERIAL PRIMARY KEY,
+                profile_id TEXT NOT NULL,
+                timestamp TIMESTAMPTZ NOT NULL,
+                domain TEXT NOT NULL,
+                root_domain TEXT,
+                device_id TEXT,
+                device_name TEXT,
+                device_model TEXT,
+                client_ip TEXT,
+                protocol TEXT,
+                encrypted BOOLEAN,
+                status TEXT,
+                reasons JSONB
+            )
+        '''))
+        conn.execute(schema_sql(conn, '''
+            CREATE INDEX IF NOT EXISTS idx_queries_profile_time ON dns_queries(profile_id, timestamp)
+        '''))
+        conn.execute(schema_sql(conn, '''
+            CREATE TABLE IF NOT EXISTS dns_fetches (
+                id SERIAL PRIMARY KEY,
+                profile_id TEXT NOT NULL,
+                time_range TEXT,
+                from_ts TIMESTAMPTZ,
+                to_ts TIMESTAMPTZ,
+                log_count INTEGER,
+                fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        '''))
+        conn.execute(schema_sql(conn, '''
+            CREATE INDEX IF NOT EXISTS idx_fetches_profile ON dns_fetches(profile_id)
+        '''))
+        conn.execute(schema_sql(conn, '''
+            CREATE TABLE IF NOT EXISTS dns_rollup_ticks (
+                profile_id TEXT NOT NULL,
+                bucket TIMESTAMPTZ NOT NULL,
+                is_blocked TEXT NOT NULL,
+                queries BIGINT NOT NULL,
+                PRIMARY KEY (profile_id, bucket, is_blocked)
+            )
+        '''))
+        conn.execute(schema_sql(conn, '''
+            CREATE TABLE IF NOT EXISTS dns_rollup_timeline (
+                profile_id TEXT NOT NULL,
+                bucket TIMESTAMPTZ NOT NULL,
+                is_blocked TEXT NOT NULL,
+                gafam TEXT NOT NULL,
+                queries BIGINT NOT NULL,
+                PRIMARY KEY (profile_id, bucket, is_blocked, gafam)
+            )
+        '''))
+        conn.execute(schema_sql(conn, '''
+            CREATE TABLE IF NOT EXISTS dns_rollup_breakdown (
+                profile_id TEXT NOT NULL,
+                bucket TIMESTAMPTZ NOT NULL,
+                is_blocked TEXT NOT NULL,
+                device_name TEXT NOT NULL,
+                root_domain TEXT NOT NULL,
+                gafam TEXT NOT NULL,
+                all_tech TEXT NOT NULL,
+                queries BIGINT NOT NULL,
+                PRIMARY KEY (profile_id, bucket, is_blocked, device_name, root_domain, gafam, all_tech)
+            )
+        '''))
+        conn.execute(schema_sql(conn, '''
+            CREATE TABLE IF NOT EXISTS dns_rollup_protocols (
+                profile_id TEXT NOT NULL,
+                bucket TIMESTAMPTZ NOT NULL,
+                device_name TEXT NOT NULL,
+                protocol TEXT NOT NULL,
+                queries BIGINT NOT NULL,
+                PRIMARY KEY (profile_id, bucket, device_name, protocol)
+            )
+        '''))
+        conn.execute(schema_sql(conn, '''
+            CREATE TABLE IF NOT EXISTS dns_staged_queries (
+                profile_id TEXT NOT NULL,
+                timestamp TIMESTAMPTZ NOT NULL,
+                domain TEXT NOT NULL,
+                root_domain TEXT,
+                device_id TEXT,
+                device_name TEXT,
+                device_model TEXT,
+                client_ip TEXT,
+                protocol TEXT,
+                encrypted BOOLEAN,
+                status TEXT,
+                reasons JSONB
+            )
+        '''))
+        conn.execute(schema_sql(conn, '''
+            CREATE INDEX IF NOT EXISTS idx_staged_queries_profile ON dns_staged_queries(profile_id)
+        '''))
+        for name, (_, keys) in ROLLUPS.items():
+            conn.execute(schema_sql(conn, f'''
+                CREATE TABLE IF NOT EXISTS {STAGED_ROLLUP_TABLES[name]} (
+                    profile_id TEXT NOT NULL,
+                    bucket TIMESTAMPTZ NOT NULL,
+                    {''.join(f'{key} TEXT NOT NULL, ' for key in keys)}
+                    queries BIGINT NOT NULL,
+                    PRIMARY KEY (profile_id, bucket, {', '.join(keys)})
+                )
+            '''))
+        conn.execute(schema_sql(conn, '''
+            CREATE TABLE IF NOT EXISTS dns_sketches (
+                profile_id TEXT NOT NULL,
+                bucket TIMESTAMPTZ NOT NULL,
+                name TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (profile_id, bucket, name)
+            )
+        '''))
+        migrate_legacy_logs(conn)
+        backfill_rollups(conn)
+        backfill_sketches(conn)
+        conn.commit()
+
+def migrate_legacy_logs(conn):
+    inspector = inspect(conn)
+    if not inspector.has_table('dns_logs'):
+        return
+    if 'log_data' not in [column['name'] for column in inspector.get_columns('dns_logs')]:
+        return
+    result = conn.execute(text('SELECT profile_id, log_data, fetched_at, time_range FROM dns_logs ORDER BY fetched_at'))
+    for profile_id, log_data, fetched_at, time_range in result.fetchall():
+        logs = json.loads(log_data) if isinstance(log_data, str) else log_data
+        rows = [row for row in (log_to_row(profile_id, log) for log in logs or []) if row]
+        if not rows:
+            continue
+        from_ts = min(row['timestamp'] for row in rows)
+        to_ts = max(row['timestamp'] for row in rows)
+        conn.execute(text(
+            'DELETE FROM dns_queries WHERE profile_id = :profile_id AND timestamp >= :from_ts AND timestamp <= :to_ts'
+        ), {'profile_id': profile_id, 'from_ts': from_ts, 'to_ts': to_ts})
+        insert_log_rows(conn, rows)
+        conn.execute(text(
+            'INSERT INTO dns_fetches (profile_id, time_range, from_ts, to_ts, log_count, fetched_at) '
+            'VALUES (:profile_id, :time_range, :from_ts, :to_ts, :log_count, :fetched_at)'
+        ), {'profile_id': profile_id, 'time_range': time_range, 'from_ts': from_ts, 'to_ts': to_ts,
+            'log_count': len(rows), 'fetched_at': fetched_at})
+    conn.execute(text('DROP TABLE dns_logs'))
+
+def backfill_rollups(conn):
+    missing = [name for name, table in ROLLUP_TABLES.items() if not conn.execute(text(f'SELECT 1 FROM {table} LIMIT 1')).fetchone()]
+    if not missing:
+        return
+    profiles = conn.execute(text('SELECT DISTINCT profile_id FROM dns_queries')).scalars().all()
+    for profile_id in profiles:
+        rollups = rollup_logs_db(conn, profile_id)
+        upsert_rollups(conn, profile_id, {name: rollups[name] for name in missing})
+
+def backfill_sketches(conn):
+    if conn.execute(text('SELECT 1 FROM dns_sketches LIMIT 1')).fetchone():
+        return
+    profiles = conn.execute(text('SELECT DISTINCT profile_id FROM dns_rollup_breakdown')).scalars().all()
+    for profile_id in profiles:
+        refresh_sketches_db(conn, profile_id)
+
+def save_credentials_db(api_key, profile_ids):
+    if not DATABASE_URL:
+        return False
+    try:
+        with get_engine().begin() as conn:
+            conn.execute(text('DELETE FROM credentials'))
+            conn.execute(text(
+                'INSERT INTO credentials (api_key, profile_id) VALUES (:api_key, :profile_id)'
+            ), [{'api_key': api_key, 'profile_id': profile_id} for profile_id in profile_ids])
+        return True
+    except SQLAlchemyError:
+        return False
+
+def load_credentials_db():
+    if not DATABASE_URL:
+        return {'api_key': '', 'profiles': []}
+    try:
+        with get_engine().connect() as conn:
+            rows = conn.execute(text('SELECT api_key, profile_id FROM credentials ORDER BY id')).fetchall()
+            if rows:
+                return {'api_key': rows[-1][0], 'profiles': list(dict.fromkeys(row[1] for row in rows))}
+    except SQLAlchemyError:
+        pass
+    return {'api_key': '', 'profiles': []}
+
+def parse_log_timestamp(value):
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=pytz.UTC)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=pytz.UTC)
+
+def format_log_timestamp(value):
+    return value.astimezone(pytz.UTC).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+def log_to_row(profile_id, log):
+    timestamp = parse_log_timestamp(log.get('timestamp'))
+    if timestamp is None:
+        return None
+    domain = log.get('domain') or ''
+    device = log.get('device')
+    if not isinstance(device, dict):
+        device = {'name': device} if device else {}
+    reasons = log.get('reasons')
+    return {
+        'profile_id': profile_id,
+        'timestamp': timestamp,
+        'domain': domain,
+        'root_domain': log.get('root') or extract_root_domain(domain),
+        'device_id': device.get('id'),
+        'device_name': device.get('name'),
+        'device_model': device.get('model'),
+        'client_ip': log.get('clientIp'),
+        'protocol': log.get('protocol'),
+        'encrypted': log.get('encrypted'),
+        'status': log.get('status'),
+        'reasons': json.dumps(reasons) if reasons is not None else None,
+    }
+
+def row_to_log(row):
+    log = {
+        'timestamp': format_log_timestamp(parse_log_timestamp(row.timestamp)),
+        'domain': row.domain,
+        'root': row.root_domain,
+        'protocol': row.protocol,
+        'encrypted': bool(row.encrypted) if row.encrypted is not None else None,
+        'clientIp': row.client_ip,
+        'status': row.status,
+    }
+    if row.device_id or row.device_name:
+        log['device'] = {'id': row.device_id, 'name': row.device_name, 'model': row.device_model}
+    if row.reasons is not None:
+        log['reasons'] = json.loads(row.reasons) if isinstance(row.reasons, str) else row.reasons
+    return log
+
+def copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, str):
+        return value.translate(COPY_ESCAPES)
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value).translate(COPY_ESCAPES)
+
+def copy_log_rows(conn, rows, table):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join([copy_value(row[col]) for col in LOG_ROW_COLUMNS]))
+        buffer.write('\n')
+    buffer.seek(0)
+    with raw_cursor(conn) as cursor:
+        cursor.copy_expert(f"COPY {table} ({', '.join(LOG_ROW_COLUMNS)}) FROM STDIN", buffer)
+
+def insert_log_rows(conn, rows, table='dns_queries'):
+    statement = text(
+        f"INSERT INTO {table} ({', '.join(LOG_ROW_COLUMNS)}) "
+        f"VALUES ({', '.join(':' + col for col in LOG_ROW_COLUMNS)})"
+    )
+    for start in range(0, len(rows), LOG_BATCH_SIZE):
+        if uses_psycopg2(conn):
+            copy_log_rows(conn, rows[start:start + LOG_BATCH_SIZE], table)
+        else:
+            conn.execute(statement, rows[start:start + LOG_BATCH_SIZE])
+
+def upsert_rollups(conn, profile_id, rollups, tables=ROLLUP_TABLES):
+    for name, table in rollups.items():
+        if table.empty:
+            continue
+        keys = ROLLUPS[name][1]
+        columns = ['profile_id', 'bucket', *keys, 'queries']
+        conflict = (
+            f"ON CONFLICT (profile_id, bucket, {', '.join(keys)}) "
+            f"DO UPDATE SET queries = {tables[name]}.queries + EXCLUDED.queries"
+        )
+        rows = table[['bucket', *keys]].astype({key: object for key in keys})
+        rows[keys] = rows[keys].where(rows[keys].notna(), '')
+        rows['queries'] = table['queries']
+        rows = rows.groupby(['bucket', *keys], as_index=False, sort=False)['queries'].sum()
+        values = [
+            (profile_id, bucket.to_pydatetime(), *rest) for bucket, *rest in rows.itertuples(index=False, name=None)
+        ]
+        if uses_psycopg2(conn):
+            from psycopg2.extras import execute_values
+            with raw_cursor(conn) as cursor:
+                execute_values(
+                    cursor,
+                    f"INSERT INTO {tables[name]} ({', '.join(columns)}) VALUES %s {conflict}",
+                    values,
+                    page_size=LOG_BATCH_SIZE,
+                )
+        else:
+            statement = text(
+                f"INSERT INTO {tables[name]} ({', '.join(columns)}) "
+                f"VALUES ({', '.join(':' + col for col in columns)}) {conflict}"
+            )
+            conn.execute(statement, [dict(zip(columns, value)) for value in values])
+
+def rollup_logs_db(conn, profile_id, since=None, until=None):
+    query = f'SELECT {LOG_COLUMNS} FROM dns_queries WHERE profile_id = :profile_id'
+    params = {'profile_id': profile_id}
+    if since:
+        query += ' AND timestamp >= :since'
+        params['since'] = since
+    if until:
+        query += ' AND timestamp < :until'
+        params['until'] = until
+    result = conn.execute(text(query), params, execution_options={'stream_results': True})
+    return merge_rollups(*(rollups_from_logs([row_to_log(row) for row in rows]) for rows in result.partitions(LOG_BATCH_SIZE)))
+
+def replace_rollups_db(conn, profile_id, from_date):
+    for name, (freq, _) in ROLLUPS.items():
+        conn.execute(text(
+            f'DELETE FROM {ROLLUP_TABLES[name]} WHERE profile_id = :profile_id AND bucket >= :start'
+        ), {'profile_id': profile_id, 'start': bucket_start(from_date, freq).to_pydatetime()})
+    since = min(bucket_start(from_date, freq) for freq, _ in ROLLUPS.values()).to_pydatetime()
+    upsert_rollups(conn, profile_id, trim_rollups(rollup_logs_db(conn, profile_id, since, from_date), from_date))
+
+def select_rollup(conn, name, profile_id, since=None):
+    freq, keys = ROLLUPS[name]
+    query = f"SELECT bucket, {', '.join(keys)}, queries FROM {ROLLUP_TABLES[name]} WHERE profile_id = :profile_id"
+    params = {'profile_id': profile_id}
+    if since:
+        query += ' AND bucket >= :start'
+        params['start'] = bucket_start(since, freq).to_pydatetime()
+    table = pd.DataFrame(conn.execute(text(query), params).fetchall(), columns=['bucket', *keys, 'queries'])
+    table['bucket'] = pd.to_datetime(table['bucket'], utc=True)
+    table['queries'] = table['queries'].astype('int64')
+    if 'protocol' in keys:
+        table['protocol'] = table['protocol'].replace('', None)
+    return table
+
+def refresh_sketches_db(conn, profile_id, since=None):
+    query = 'DELETE FROM dns_sketches WHERE profile_id = :profile_id'
+    params = {'profile_id': profile_id}
+    if since:
+        query += ' AND bucket >= :start'
+        params['start'] = bucket_start(since, BREAKDOWN_FREQ).to_pydatetime()
+    conn.execute(text(query), params)
+    rows = sketch_rows(build_sketches(select_rollup(conn, 'breakdown', profile_id, since)))
+    if rows:
+        conn.execute(text(
+            'INSERT INTO dns_sketches (profile_id, bucket, name, data) VALUES (:profile_id, :bucket, :name, :data)'
+        ), [{'profile_id': profile_id, 'bucket': day.to_pydatetime(), 'name': name, 'data': data} for day, name, data in rows])
+
+def clear_staged_db(conn, profile_id):
+    for table in ['dns_staged_queries', *STAGED_ROLLUP_TABLES.values()]:
+        conn.execute(text(f'DELETE FROM {table} WHERE profile_id = :profile_id'), {'profile_id': profile_id})
+
+def publish_staged_db(conn, profile_id):
+    columns = ', '.join(LOG_ROW_COLUMNS)
+    conn.execute(text(
+        f'INSERT INTO dns_queries ({columns}) SELECT {columns} FROM dns_staged_queries WHERE profile_id = :profile_id'
+    ), {'profile_id': profile_id})
+    for name, (_, keys) in ROLLUPS.items():
+        columns = ', '.join(['profile_id', 'bucket', *keys, 'queries'])
+        conn.execute(text(
+            f"INSERT INTO {ROLLUP_TABLES[name]} ({columns}) "
+            f"SELECT {columns} FROM {STAGED_ROLLUP_TABLES[name]} WHERE profile_id = :profile_id "
+            f"ON CONFLICT (profile_id, bucket, {', '.join(keys)}) "
+            f"DO UPDATE SET queries = {ROLLUP_TABLES[name]}.queries + EXCLUDED.queries"
+        ), {'profile_id': profile_id})
+    clear_staged_db(conn, profile_id)
+
+def store_log_batches_db(profile_id, batches, time_range, from_date, to_date, replace=True):
+    engine = get_engine()
+    with engine.begin() as conn:
+        clear_staged_db(conn, profile_id)
+    log_count = 0
+    touched_since = from_date if replace else None
+    try:
+        for batch in batches:
+            rows = [row for row in (log_to_row(profile_id, log) for log in batch) if row]
+            batch_rollups = rollups_from_logs(batch)
+            with engine.begin() as conn:
+                insert_log_rows(conn, rows, 'dns_staged_queries')
+                upsert_rollups(conn, profile_id, batch_rollups, STAGED_ROLLUP_TABLES)
+            if not batch_rollups['breakdown'].empty:
+                first_bucket = batch_rollups['breakdown']['bucket'].min().to_pydatetime()
+                touched_since = first_bucket if touched_since is None else min(touched_since, first_bucket)
+            log_count += len(rows)
+            yield batch
+    except BaseException:
+        with engine.begin() as conn:
+            clear_staged_db(conn, profile_id)
+        raise
+    with engine.begin() as conn:
+        if replace:
+            conn.execute(text(
+                'DELETE FROM dns_queries WHERE profile_id = :profile_id AND timestamp >= :from_ts AND timestamp < :to_ts'
+            ), {'profile_id': profile_id, 'from_ts': from_date, 'to_ts': to_date})
+            replace_rollups_db(conn, profile_id, from_date)
+        publish_staged_db(conn, profile_id)
+        if touched_since is not None:
+            refresh_sketches_db(conn, profile_id, touched_since)
+        conn.execute(text(
+            'INSERT INTO dns_fetches (profile_id, time_range, from_ts, to_ts, log_count) '
+            'VALUES (:profile_id, :time_range, :from_ts, :to_ts, :log_count)'
+        ), {'profile_id': profile_id, 'time_range': time_range, 'from_ts': from_date, 'to_ts': to_date,
+            'log_count': log_count})
+
+def load_logs_db(profile_id, since=None, until=None):
+    if not DATABASE_URL:
+        return None, None, None
+    try:
+        with get_engine().connect() as conn:
+            fetch = conn.execute(text(
+                'SELECT fetched_at, time_range FROM dns_fetches WHERE profile_id = :profile_id ORDER BY fetched_at DESC LIMIT 1'
+            ), {'profile_id': profile_id}).fetchone()
+            if not fetch:
+                return None, None, None
+            query = f'SELECT {LOG_COLUMNS} FROM dns_queries WHERE profile_id = :profile_id'
+            params = {'profile_id': profile_id}
+            if since:
+                query += ' AND timestamp >= :since'
+                params['since'] = since
+            if until:
+                query += ' AND timestamp < :until'
+                params['until'] = until
+            result = conn.execution_options(stream_results=True).execute(text(query + ' ORDER BY timestamp'), params)
+            logs = logs_to_frame([row_to_log(row) for row in rows] for rows in result.partitions(LOG_BATCH_SIZE))
+            if not logs.empty:
+                return logs, parse_log_timestamp(fetch[0]), fetch[1]
+    except SQLAlchemyError:
+        pass
+    return None, None, None
+
+def load_log_stats_db(profile_id, since=None):
+    if not DATABASE_URL:
+        return 0, None, None
+    try:
+        with get_engine().connect() as conn:
+            fetch = conn.execute(text(
+                'SELECT fetched_at, time_range FROM dns_fetches WHERE profile_id = :profile_id ORDER BY fetched_at DESC LIMIT 1'
+            ), {'profile_id': profile_id}).fetchone()
+            if not fetch:
+                return 0, None, None
+            query = 'SELECT COUNT(*) FROM dns_queries WHERE profile_id = :profile_id'
+            params = {'profile_id': profile_id}
+            if since:
+                query += ' AND timestamp >= :since'
+                params['since'] = since
+            return conn.execute(text(query), params).scalar(), parse_log_timestamp(fetch[0]), fetch[1]
+    except SQLAlchemyError:
+        return 0, None, None
+
+def load_rollups_db(profile_id, since=None, names=ROLLUPS):
+    if not DATABASE_URL:
+        return None
+    try:
+        with get_engine().connect() as conn:
+            latest_tick = conn.execute(text(
+                'SELECT MAX(bucket) FROM dns_rollup_ticks WHERE profile_id = :profile_id'
+            ), {'profile_id': profile_id}).scalar()
+            tick_since = ticks_since(since, None if latest_tick is None else pd.to_datetime(latest_tick, utc=True))
+            return {
+                name: select_rollup(conn, name, profile_id, tick_since if name == 'ticks' else since) for name in names
+            }
+    except SQLAlchemyError:
+        return None
+
+def load_sketches_db(profile_id, since=None):
+    if not DATABASE_URL:
+        return None
+    try:
+        with get_engine().connect() as conn:
+            query = 'SELECT bucket, name, data FROM dns_sketches WHERE profile_id = :profile_id'
+            params = {'profile_id': profile_id}
+            if since:
+                query += ' AND bucket >= :start'
+                params['start'] = bucket_start(since, BREAKDOWN_FREQ).to_pydatetime()
+            return sketches_from_rows(conn.execute(text(query), params).fetchall())
+    except SQLAlchemyError:
+        return None
+
+def load_sync_boundary_db(profile_id):
+    if not DATABASE_URL:
+        return None, []
+    try:
+        with get_engine().connect() as conn:
+            latest = conn.execute(text(
+                'SELECT MAX(timestamp) FROM dns_queries WHERE profile_id = :profile_id'
+            ), {'profile_id': profile_id}).scalar()
+            if latest is None:
+                return None, []
+            boundary = parse_log_timestamp(latest).replace(microsecond=0)
+            result = conn.execute(text(
+                f'SELECT {LOG_COLUMNS} FROM dns_queries WHERE profile_id = :profile_id AND timestamp >= :boundary'
+            ), {'profile_id': profile_id, 'boundary': boundary})
+            return boundary, [row_to_log(row) for row in result]
+    except SQLAlchemyError:
+        return None, []
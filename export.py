@@ -0,0 +1,63 @@
+import gzip
+import io
+import json
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+EXPORT_CHUNK_ROWS = 100000
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'CSV (gzip)': ('csv.gz', 'application/gzip'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+
+def export_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if value is None or value != value:
+        return None
+    return str(value)
+
+def export_chunk(frame, rows, columns):
+    chunk = frame.take(rows)[columns]
+    objects = {
+        col: chunk[col].map(export_value) for col in columns
+        if chunk[col].dtype == object and pd.api.types.infer_dtype(chunk[col], skipna=True) not in ('string', 'empty')
+    }
+    return chunk.assign(**objects) if objects else chunk
+
+def export_schema(frame, columns):
+    schema = pa.Schema.from_pandas(frame[columns].head(0), preserve_index=False)
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            schema = schema.set(i, field.with_type(pa.string()))
+    return schema
+
+def write_csv(frame, order, columns, target):
+    text = io.TextIOWrapper(target, encoding='utf-8', newline='')
+    for start in range(0, max(len(order), 1), EXPORT_CHUNK_ROWS):
+        export_chunk(frame, order[start:start + EXPORT_CHUNK_ROWS], columns).to_csv(text, header=start == 0, index=False)
+    text.flush()
+    text.detach()
+
+def write_parquet(frame, order, columns, target):
+    schema = export_schema(frame, columns)
+    with pq.ParquetWriter(target, schema, compression='zstd') as writer:
+        for start in range(0, len(order), EXPORT_CHUNK_ROWS):
+            chunk = export_chunk(frame, order[start:start + EXPORT_CHUNK_ROWS], columns)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+def export_rows(frame, order, columns, export_format):
+    with tempfile.TemporaryFile() as target:
+        if export_format == 'CSV':
+            write_csv(frame, order, columns, target)
+        elif export_format == 'CSV (gzip)':
+            with gzip.GzipFile(fileobj=target, mode='wb') as compressed:
+                write_csv(frame, order, columns, compressed)
+        else:
+            write_parquet(frame, order, columns, target)
+        target.seek(0)
+        return target.read()
@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from collections import Counter, deque
+from datetime import timedelta
+from itertools import islice
+
+import pandas as pd
+
+import nextdns_api
+from processing import logs_to_frame, normalize_logs
+from rollups import ROLLUPS, build_rollups, empty_rollup, merge_rollups, trim_rollups
+
+LIVE_BUFFER_SIZE = int(os.environ.get('NEXTDNS_LIVE_BUFFER', '10000'))
+LIVE_IDLE_SECONDS = float(os.environ.get('NEXTDNS_LIVE_IDLE', '120'))
+LIVE_WINDOW = timedelta(hours=24)
+LIVE_MINUTES = timedelta(hours=1)
+RECENT_ROWS = 50
+
+tails = {}
+tail_subscribers = Counter()
+tails_lock = threading.Lock()
+
+def empty_minutes():
+    return pd.DataFrame({
+        'bucket': pd.Series(dtype='datetime64[ns, UTC]'),
+        'is_blocked': pd.Series(dtype=object),
+        'queries': pd.Series(dtype='int64'),
+    })
+
+def minute_counts(frame):
+    frame = frame[frame['timestamp'].notna()] if 'timestamp' in frame.columns else frame.iloc[0:0]
+    if frame.empty:
+        return empty_minutes()
+    bucket = frame['timestamp'].dt.tz_convert('UTC').dt.floor('min').rename('bucket')
+    counts = frame.groupby([bucket, frame['is_blocked'].astype(object)], observed=True).size()
+    return counts.reset_index(name='queries')
+
+def merge_minutes(*tables):
+    tables = [table for table in tables if not table.empty]
+    if not tables:
+        return empty_minutes()
+    if len(tables) == 1:
+        return tables[0]
+    return pd.concat(tables, ignore_index=True).groupby(['bucket', 'is_blocked'])['queries'].sum().reset_index()
+
+def new_tail(profile_id, buffer_size):
+    return {
+        'profile_id': profile_id,
+        'buffer': deque(maxlen=buffer_size),
+        'pending': [],
+        'lock': threading.Lock(),
+        'stop': threading.Event(),
+        'last_event_id': None,
+        'received': 0,
+        'rollups': {name: empty_rollup(name) for name in ROLLUPS},
+        'minutes': empty_minutes(),
+        'connected': False,
+        'error': None,
+        'started_at': pd.Timestamp.now(tz='UTC'),
+        'read_at': time.monotonic(),
+    }
+
+def run_tail(tail, api_key):
+    attempt = 0
+    while not tail['stop'].is_set():
+        try:
+            for event_id, log in nextdns_api.iter_stream_events(api_key, tail['profile_id'], tail['last_event_id']):
+                with tail['lock']:
+                    tail['buffer'].append(log)
+                    tail['pending'].append(log)
+                    tail['received'] += 1
+                    tail['last_event_id'] = event_id or tail['last_event_id']
+                    tail['connected'] = True
+                    tail['error'] = None
+                attempt = 0
+                if tail['stop'].is_set() or time.monotonic() - tail['read_at'] > LIVE_IDLE_SECONDS:
+                    return
+            tail['connected'] = False
+        except nextdns_api.FetchError as e:
+            tail['connected'] = False
+            tail['error'] = str(e)
+            if not e.retryable:
+                return
+        tail['stop'].wait(nextdns_api.retry_delay(attempt))
+        attempt += 1
+        if time.monotonic() - tail['read_at'] > LIVE_IDLE_SECONDS:
+            return
+
+def get_tail(api_key, profile_id, buffer_size=LIVE_BUFFER_SIZE):
+    key = (api_key, profile_id)
+    with tails_lock:
+        tail = tails.get(key)
+        if tail is None or not tail['thread'].is_alive():
+            tail = new_tail(profile_id, buffer_size)
+            tail['thread'] = threading.Thread(target=run_tail, args=(tail, api_key), daemon=True)
+            tail['thread'].start()
+            tails[key] = tail
+        return tail
+
+def hold_tails(keys):
+    with tails_lock:
+        tail_subscribers.update(keys)
+
+def release_tails(keys):
+    with tails_lock:
+        for key in keys:
+            tail_subscribers[key] -= 1
+            if tail_subscribers[key] > 0:
+                continue
+            del tail_subscribers[key]
+            tail = tails.pop(key, None)
+            if tail is not None:
+                tail['stop'].set()
+
+def tail_snapshot(tail):
+    with tail['lock']:
+        pending, tail['pending'] = tail['pending'], []
+        tail['read_at'] = time.monotonic()
+        if pending:
+            frame = normalize_logs(logs_to_frame([pending]))
+            now = pd.Timestamp.now(tz='UTC')
+            tail['rollups'] = trim_rollups(merge_rollups(tail['rollups'], build_rollups(frame)), now - LIVE_WINDOW)
+            minutes = merge_minutes(tail['minutes'], minute_counts(frame))
+            tail['minutes'] = minutes[minutes['bucket'] >= (now - LIVE_MINUTES).floor('min')]
+        return {
+            'rollups': tail['rollups'],
+            'minutes': tail['minutes'],
+            'recent': list(islice(reversed(tail['buffer']), RECENT_ROWS)),
+            'buffered': len(tail['buffer']),
+            'received': tail['received'],
+            'connected': tail['connected'],
+            'error': tail['error'],
+            'running': tail['thread'].is_alive(),
+            'started_at': tail['started_at'],
+        }
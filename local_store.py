@@ -0,0 +1,364 @@
+import json
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import pytz
+from pyarrow import fs
+
+from database import log_to_row, parse_log_timestamp, row_to_log
+from processing import compact_frame, normalize_logs
+from rollups import BREAKDOWN_FREQ, ROLLUPS, TICK_SPAN, bucket_start, build_rollups, empty_rollup, recent_ticks
+from sketches import build_sketches, sketch_rows, sketches_from_rows
+
+STORE_DIR = os.environ.get('NEXTDNS_DATA_DIR', 'nextdns_data')
+
+STORE_FLUSH_ROWS = 250000
+MAX_DAY_PARTS = 16
+LOG_SCHEMA = pa.schema([
+    ('timestamp', pa.timestamp('us', tz='UTC')),
+    ('domain', pa.string()),
+    ('root_domain', pa.string()),
+    ('device_id', pa.string()),
+    ('device_name', pa.string()),
+    ('device_model', pa.string()),
+    ('client_ip', pa.string()),
+    ('protocol', pa.string()),
+    ('encrypted', pa.bool_()),
+    ('status', pa.string()),
+    ('reasons', pa.string()),
+])
+ROLLUP_SCHEMAS = {
+    name: pa.schema([('bucket', pa.timestamp('us', tz='UTC')), *[(key, pa.string()) for key in keys], ('queries', pa.int64())])
+    for name, (_, keys) in ROLLUPS.items()
+}
+SKETCH_SCHEMA = pa.schema([('bucket', pa.timestamp('us', tz='UTC')), ('name', pa.string()), ('data', pa.string())])
+DAY_PARTITIONING = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+FRAME_COLUMNS = {
+    'root_domain': 'root', 'client_ip': 'clientIp', 'device_id': 'device.id', 'device_name': 'device.name',
+    'device_model': 'device.model',
+}
+
+store_lock = threading.Lock()
+
+class StoreError(Exception):
+    pass
+
+def profile_dir(kind, profile_id, root=None):
+    return os.path.join(os.path.abspath(root or STORE_DIR), kind, f'profile_id={profile_id}')
+
+def day_key(value):
+    return value.astimezone(pytz.UTC).strftime('%Y-%m-%d')
+
+def day_dir(kind, profile_id, day, root=None):
+    return os.path.join(profile_dir(kind, profile_id, root), f'date={day}')
+
+def stored_days(kind, profile_id, root=None):
+    try:
+        entries = os.listdir(profile_dir(kind, profile_id, root))
+    except FileNotFoundError:
+        return []
+    return sorted(entry[len('date='):] for entry in entries if entry.startswith('date='))
+
+def write_part(directory, table):
+    os.makedirs(directory, exist_ok=True)
+    pq.write_table(table, os.path.join(directory, f'part-{uuid.uuid4().hex}.parquet'), compression='zstd')
+
+def rollup_table(name, table):
+    keys = ROLLUPS[name][1]
+    rows = table.astype({key: object for key in keys})
+    rows[keys] = rows[keys].where(rows[keys].notna(), None)
+    return pa.Table.from_pandas(rows[['bucket', *keys, 'queries']], schema=ROLLUP_SCHEMAS[name], preserve_index=False)
+
+def write_days(directory, table, column):
+    table = table.sort_by(column)
+    ds.write_dataset(
+        table.append_column('date', pc.strftime(table[column], format='%Y-%m-%d')),
+        directory,
+        format='parquet',
+        partitioning=DAY_PARTITIONING,
+        basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet',
+        existing_data_behavior='overwrite_or_ignore',
+        file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'),
+    )
+
+def write_logs(root, profile_id, table):
+    if table.num_rows:
+        write_days(profile_dir('logs', profile_id, root), table, 'timestamp')
+
+def write_rollups(root, profile_id, rollups):
+    for name, table in rollups.items():
+        if not table.empty:
+            write_days(profile_dir(name, profile_id, root), rollup_table(name, table), 'bucket')
+
+def select_days(kind, profile_id, since=None, until=None, root=None):
+    first = day_key(since) if since is not None else None
+    last = day_key(until) if until is not None else None
+    return [
+        day for day in stored_days(kind, profile_id, root)
+        if (first is None or day >= first) and (last is None or day <= last)
+    ]
+
+def open_days(kind, profile_id, since=None, until=None, root=None):
+    files = [
+        os.path.join(day_dir(kind, profile_id, day, root), entry)
+        for day in select_days(kind, profile_id, since, until, root)
+        for entry in sorted(os.listdir(day_dir(kind, profile_id, day, root)))
+        if entry.endswith('.parquet')
+    ]
+    if not files:
+        return None, None
+    dataset = ds.dataset(
+        files,
+        format='parquet',
+        partitioning=DAY_PARTITIONING,
+        partition_base_dir=profile_dir(kind, profile_id, root),
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+    column = ds.field('timestamp' if kind == 'logs' else 'bucket')
+    condition = None
+    if since is not None:
+        condition = column >= pa.scalar(since, pa.timestamp('us', tz='UTC'))
+    if until is not None:
+        upper = column < pa.scalar(until, pa.timestamp('us', tz='UTC'))
+        condition = upper if condition is None else condition & upper
+    return dataset, condition
+
+def read_days(kind, profile_id, columns, since=None, until=None, root=None):
+    dataset, condition = open_days(kind, profile_id, since, until, root)
+    if dataset is None:
+        return None
+    return dataset.to_table(columns=columns, filter=condition)
+
+def sum_rollup(name, frame):
+    return frame.groupby(['bucket', *ROLLUPS[name][1]], dropna=False)['queries'].sum().reset_index()
+
+def rollups_from_table(table):
+    columns = ['timestamp', 'domain', 'device_name', 'protocol', 'status']
+    frame = table.select(columns).to_pandas(coerce_temporal_nanoseconds=True).rename(columns=FRAME_COLUMNS)
+    return build_rollups(normalize_logs(frame))
+
+def write_batch(root, profile_id, table):
+    write_logs(root, profile_id, table)
+    write_rollups(root, profile_id, rollups_from_table(table))
+
+def table_to_logs(table):
+    frame = table.sort_by('timestamp').to_pandas(coerce_temporal_nanoseconds=True)
+    frame = frame.rename(columns=FRAME_COLUMNS)
+    reasons = frame['reasons']
+    frame['reasons'] = [json.loads(value) if value is not None else None for value in reasons]
+    return compact_frame(frame)
+
+def rewrite_day(profile_id, day, until):
+    day_start = datetime.strptime(day, '%Y-%m-%d').replace(tzinfo=pytz.UTC)
+    kept = read_days('logs', profile_id, list(LOG_SCHEMA.names), day_start, until)
+    for kind in ['logs', *ROLLUPS, 'sketches']:
+        shutil.rmtree(day_dir(kind, profile_id, day), ignore_errors=True)
+    if kept is None or kept.num_rows == 0:
+        return
+    write_batch(None, profile_id, kept)
+
+def replace_days(profile_id, from_date):
+    first_day = day_key(from_date)
+    for kind in ['logs', *ROLLUPS, 'sketches']:
+        for day in stored_days(kind, profile_id):
+            if day > first_day:
+                shutil.rmtree(day_dir(kind, profile_id, day), ignore_errors=True)
+    if first_day in stored_days('logs', profile_id):
+        rewrite_day(profile_id, first_day, from_date)
+
+def compact_day(kind, profile_id, day, root=None, max_parts=MAX_DAY_PARTS):
+    directory = day_dir(kind, profile_id, day, root)
+    parts = [os.path.join(directory, entry) for entry in os.listdir(directory) if entry.endswith('.parquet')]
+    if len(parts) <= max_parts:
+        return
+    table = pa.concat_tables([pq.read_table(part, memory_map=True) for part in parts])
+    if kind != 'logs':
+        table = rollup_table(kind, sum_rollup(kind, table.to_pandas(coerce_temporal_nanoseconds=True)))
+    write_part(directory, table)
+    for part in parts:
+        os.remove(part)
+
+def publish_staged(staging, profile_id):
+    touched = []
+    for kind in ['logs', *ROLLUPS]:
+        for day in stored_days(kind, profile_id, staging):
+            compact_day(kind, profile_id, day, staging, 1)
+            source = day_dir(kind, profile_id, day, staging)
+            target = day_dir(kind, profile_id, day)
+            os.makedirs(target, exist_ok=True)
+            for entry in os.listdir(source):
+                os.replace(os.path.join(source, entry), os.path.join(target, entry))
+            touched.append((kind, day))
+    for kind, day in touched:
+        compact_day(kind, profile_id, day)
+    return touched
+
+def refresh_sketches_local(profile_id, days):
+    keys = ROLLUPS['breakdown'][1]
+    for day in days:
+        shutil.rmtree(day_dir('sketches', profile_id, day), ignore_errors=True)
+        day_start = datetime.strptime(day, '%Y-%m-%d').replace(tzinfo=pytz.UTC)
+        table = read_days('breakdown', profile_id, ['bucket', *keys, 'queries'], day_start, day_start + timedelta(days=1))
+        if table is None or table.num_rows == 0:
+            continue
+        rows = sketch_rows(build_sketches(sum_rollup('breakdown', table.to_pandas(coerce_temporal_nanoseconds=True))))
+        sketches = pa.Table.from_pylist(
+            [{'bucket': bucket.to_pydatetime(), 'name': name, 'data': data} for bucket, name, data in rows], schema=SKETCH_SCHEMA
+        )
+        write_days(profile_dir('sketches', profile_id), sketches, 'bucket')
+
+def record_fetch(profile_id, time_range, from_date, to_date, log_count):
+    fetch = {
+        'profile_id': profile_id,
+        'time_range': time_range,
+        'from_ts': from_date.isoformat(),
+        'to_ts': to_date.isoformat(),
+        'log_count': log_count,
+        'fetched_at': datetime.now(pytz.UTC).isoformat(),
+    }
+    os.makedirs(STORE_DIR, exist_ok=True)
+    with open(os.path.join(STORE_DIR, 'fetches.jsonl'), 'a') as f:
+        f.write(json.dumps(fetch) + '\n')
+
+def latest_fetch(profile_id):
+    latest = None
+    try:
+        with open(os.path.join(STORE_DIR, 'fetches.jsonl'), 'r') as f:
+            for line in f:
+                fetch = json.loads(line)
+                if fetch.get('profile_id') == profile_id:
+                    latest = fetch
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    return latest
+
+def store_log_batches_local(profile_id, batches, time_range, from_date, to_date, replace=True):
+    staging = os.path.join(STORE_DIR, '.staging', uuid.uuid4().hex)
+    try:
+        log_count = 0
+        pending = []
+        for batch in batches:
+            rows = [row for row in (log_to_row(profile_id, log) for log in batch) if row]
+            pending.append(pa.Table.from_pylist(rows, schema=LOG_SCHEMA))
+            log_count += len(rows)
+            if sum(table.num_rows for table in pending) >= STORE_FLUSH_ROWS:
+                write_batch(staging, profile_id, pa.concat_tables(pending))
+                pending = []
+            yield batch
+        if pending:
+            write_batch(staging, profile_id, pa.concat_tables(pending))
+        with store_lock:
+            if replace:
+                replace_days(profile_id, from_date)
+            touched = publish_staged(staging, profile_id)
+            days = {day for kind, day in touched if kind == 'breakdown'}
+            if replace:
+                days.add(day_key(from_date))
+            refresh_sketches_local(profile_id, sorted(days))
+            record_fetch(profile_id, time_range, from_date, to_date, log_count)
+    except (OSError, pa.ArrowException) as e:
+        raise StoreError(str(e)) from e
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+def load_logs_local(profile_id, since=None, until=None):
+    if not STORE_DIR:
+        return None, None, None
+    fetch = latest_fetch(profile_id)
+    if not fetch:
+        return None, None, None
+    try:
+        table = read_days('logs', profile_id, list(LOG_SCHEMA.names), since, until)
+    except (OSError, pa.ArrowException):
+        return None, None, None
+    if table is None or table.num_rows == 0:
+        return None, None, None
+    return table_to_logs(table), parse_log_timestamp(fetch['fetched_at']), fetch['time_range']
+
+def load_log_stats_local(profile_id, since=None):
+    if not STORE_DIR:
+        return 0, None, None
+    fetch = latest_fetch(profile_id)
+    if not fetch:
+        return 0, None, None
+    try:
+        dataset, condition = open_days('logs', profile_id, since)
+        count = dataset.count_rows(filter=condition) if dataset is not None else 0
+    except (OSError, pa.ArrowException):
+        return 0, None, None
+    return count, parse_log_timestamp(fetch['fetched_at']), fetch['time_range']
+
+def backfill_rollup_local(name, profile_id):
+    for day in stored_days('logs', profile_id):
+        day_start = datetime.strptime(day, '%Y-%m-%d').replace(tzinfo=pytz.UTC)
+        table = read_days('logs', profile_id, list(LOG_SCHEMA.names), day_start, day_start + timedelta(days=1))
+        if table is not None and table.num_rows:
+            write_days(profile_dir(name, profile_id), rollup_table(name, rollups_from_table(table)[name]), 'bucket')
+
+def load_rollups_local(profile_id, since=None, names=ROLLUPS):
+    if not STORE_DIR:
+        return None
+    rollups = {}
+    try:
+        for name in names:
+            freq, keys = ROLLUPS[name]
+            if not stored_days(name, profile_id) and stored_days('logs', profile_id):
+                with store_lock:
+                    if not stored_days(name, profile_id):
+                        backfill_rollup_local(name, profile_id)
+            start = bucket_start(since, freq).to_pydatetime() if since else None
+            days = stored_days(name, profile_id) if name == 'ticks' else []
+            if days:
+                recent = datetime.strptime(days[-1], '%Y-%m-%d').replace(tzinfo=pytz.UTC) - TICK_SPAN
+                start = recent if start is None or recent > start else start
+            table = read_days(name, profile_id, ['bucket', *keys, 'queries'], start)
+            if table is None or table.num_rows == 0:
+                rollups[name] = empty_rollup(name)
+            else:
+                rollups[name] = sum_rollup(name, table.to_pandas(coerce_temporal_nanoseconds=True))
+    except (OSError, pa.ArrowException):
+        return None
+    return recent_ticks(rollups)
+
+def load_sketches_local(profile_id, since=None):
+    if not STORE_DIR:
+        return None
+    try:
+        if not stored_days('sketches', profile_id) and stored_days('breakdown', profile_id):
+            with store_lock:
+                if not stored_days('sketches', profile_id):
+                    refresh_sketches_local(profile_id, stored_days('breakdown', profile_id))
+        start = bucket_start(since, BREAKDOWN_FREQ).to_pydatetime() if since else None
+        table = read_days('sketches', profile_id, ['bucket', 'name', 'data'], start)
+    except (OSError, pa.ArrowException):
+        return None
+    if table is None:
+        return {}
+    frame = table.to_pandas(coerce_temporal_nanoseconds=True)
+    return sketches_from_rows(zip(frame['bucket'], frame['name'], frame['data']))
+
+def load_sync_boundary_local(profile_id):
+    if not STORE_DIR:
+        return None, []
+    days = stored_days('logs', profile_id)
+    if not days:
+        return None, []
+    try:
+        day_start = datetime.strptime(days[-1], '%Y-%m-%d').replace(tzinfo=pytz.UTC)
+        table = read_days('logs', profile_id, list(LOG_SCHEMA.names), day_start)
+    except (OSError, pa.ArrowException):
+        return None, []
+    if table is None or table.num_rows == 0:
+        return None, []
+    latest = pc.max(table['timestamp']).as_py()
+    boundary = parse_log_timestamp(latest).replace(microsecond=0)
+    table = table.filter(ds.field('timestamp') >= pa.scalar(boundary, pa.timestamp('us', tz='UTC')))
+    return boundary, [row_to_log(SimpleNamespace(**row)) for row in table.to_pylist()]
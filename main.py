@@ -1,5 +1,74 @@
+import argparse
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+from database import init_database
+from sync import SyncBusyError, load_saved_credentials, parse_profiles, select_storage, sync_profiles
+
+SYNC_INTERVAL = int(os.environ.get('NEXTDNS_SYNC_INTERVAL', '300'))
+SYNC_DAYS = int(os.environ.get('NEXTDNS_SYNC_DAYS', '30'))
+
+logger = logging.getLogger('nextdns_sync')
+
+def sync_credentials(db_initialized, profiles):
+    saved = load_saved_credentials(db_initialized)
+    api_key = os.environ.get('NEXTDNS_API_KEY') or saved.get('api_key')
+    if not profiles:
+        profiles = parse_profiles(os.environ.get('NEXTDNS_PROFILE_ID', ''))
+    if not profiles:
+        profiles = saved.get('profiles', [])
+    return api_key, profiles
+
+def sync_once(api_key, profiles, storage, days):
+    to_date = datetime.now(pytz.UTC)
+    from_date = to_date - timedelta(days=days)
+    results = sync_profiles(api_key, profiles, storage, f'Last {days} days', from_date, to_date)
+    for profile_id, (result, error) in results.items():
+        if isinstance(error, SyncBusyError):
+            logger.info('%s, skipping', error)
+        elif error:
+            logger.error('%s: sync failed: %s', profile_id, error)
+        else:
+            log_count, fetch_from = result
+            logger.info('%s: stored %d logs since %s', profile_id, log_count, fetch_from.isoformat())
+
 def main():
-    print("Hello from repl-nix-workspace!")
+    parser = argparse.ArgumentParser(description='Background sync worker that keeps stored NextDNS logs up to date')
+    parser.add_argument(
+        '--profile', action='append',
+        help='profile ID to sync (repeatable; default: NEXTDNS_PROFILE_ID or saved credentials); profiles sync concurrently'
+    )
+    parser.add_argument(
+        '--days', type=int, default=SYNC_DAYS, help='days of history to fetch when a profile has no recent logs (default: %(default)s)'
+    )
+    parser.add_argument('--interval', type=int, default=SYNC_INTERVAL, help='seconds between runs (default: %(default)s)')
+    parser.add_argument('--once', action='store_true', help='run a single sync and exit')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    db_initialized, db_error = init_database()
+    if db_error:
+        logger.error('Database error: %s', db_error)
+    storage = select_storage(db_initialized)
+    if storage is None:
+        parser.error('no storage configured; set DATABASE_URL or NEXTDNS_DATA_DIR')
+
+    while True:
+        try:
+            api_key, profiles = sync_credentials(db_initialized, args.profile)
+            if api_key and profiles:
+                sync_once(api_key, profiles, storage, args.days)
+            else:
+                logger.warning('No API key or profile ID; set NEXTDNS_API_KEY and NEXTDNS_PROFILE_ID or save credentials in the dashboard')
+        except Exception:
+            logger.exception('Sync run failed')
+        if args.once:
+            break
+        time.sleep(args.interval)
 
 
 if __name__ == "__main__":
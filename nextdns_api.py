@@ -0,0 +1,339 @@
+import json
+import math
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+
+import pytz
+import requests
+from requests.adapters import HTTPAdapter
+
+API_BASE_URL = os.environ.get('NEXTDNS_API_URL', 'https://api.nextdns.io').rstrip('/')
+FETCH_WORKERS = int(os.environ.get('NEXTDNS_FETCH_WORKERS', '4'))
+FETCH_RETRIES = int(os.environ.get('NEXTDNS_FETCH_RETRIES', '5'))
+BATCH_SIZE = int(os.environ.get('NEXTDNS_BATCH_SIZE', '5000'))
+REQUEST_RATE = float(os.environ.get('NEXTDNS_REQUEST_RATE', '10'))
+REQUEST_BURST = float(os.environ.get('NEXTDNS_REQUEST_BURST', '10'))
+POOL_SIZE = int(os.environ.get('NEXTDNS_POOL_SIZE', '16'))
+STREAM_READ_TIMEOUT = float(os.environ.get('NEXTDNS_STREAM_TIMEOUT', '90'))
+RETRY_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+STREAM_TYPES = ('application/x-ndjson', 'text/event-stream')
+SUMMARY_LIMIT = 50
+SUMMARY_QUERIES = {
+    'status': ('status', {}),
+    'default_domains': ('domains', {'status': 'default', 'root': 'true', 'limit': SUMMARY_LIMIT}),
+    'allowed_domains': ('domains', {'status': 'allowed', 'root': 'true', 'limit': SUMMARY_LIMIT}),
+    'blocked_domains': ('domains', {'status': 'blocked', 'root': 'true', 'limit': SUMMARY_LIMIT}),
+    'devices': ('devices', {'limit': SUMMARY_LIMIT}),
+}
+MIN_SLICE = timedelta(minutes=15)
+MAX_SLICE = timedelta(days=1)
+PAGE_LIMIT = 500
+
+rate_lock = threading.Lock()
+request_tokens = REQUEST_BURST
+tokens_at = time.monotonic()
+paused_until = 0.0
+
+class FetchError(Exception):
+    def __init__(self, message, retryable=False, exhausted=False):
+        super().__init__(message)
+        self.retryable = retryable
+        self.exhausted = exhausted
+
+@lru_cache(maxsize=None)
+def get_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def wait_for_request():
+    global request_tokens, tokens_at
+    if REQUEST_RATE <= 0:
+        return
+    while True:
+        with rate_lock:
+            now = time.monotonic()
+            if now < paused_until:
+                delay = paused_until - now
+            else:
+                request_tokens = min(REQUEST_BURST, request_tokens + (now - tokens_at) * REQUEST_RATE)
+                tokens_at = now
+                if request_tokens >= 1:
+                    request_tokens -= 1
+                    return
+                delay = (1 - request_tokens) / REQUEST_RATE
+        time.sleep(delay)
+
+def pause_requests(seconds):
+    global request_tokens, tokens_at, paused_until
+    with rate_lock:
+        paused_until = max(paused_until, time.monotonic() + seconds)
+        request_tokens = 0.0
+        tokens_at = paused_until
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=pytz.UTC)
+    return max(0.0, (retry_at - datetime.now(pytz.UTC)).total_seconds())
+
+def retry_delay(attempt, response=None):
+    retry_after = parse_retry_after(response.headers.get('Retry-After')) if response is not None else None
+    if retry_after is not None:
+        return retry_after
+    backoff = min(MAX_BACKOFF, RETRY_BACKOFF * 2 ** attempt)
+    return backoff / 2 + random.uniform(0, backoff / 2)
+
+def is_stream(response):
+    content_type = response.headers.get('Content-Type', '')
+    return any(stream_type in content_type for stream_type in STREAM_TYPES)
+
+def api_get(api_key, path, params=None, timeout=60, retries=FETCH_RETRIES):
+    url = f'{API_BASE_URL}/{path}'
+    for attempt in range(retries + 1):
+        wait_for_request()
+        response = None
+        try:
+            response = get_session().get(url, headers={'X-Api-Key': api_key}, params=params, timeout=timeout, stream=True)
+            if not is_stream(response):
+                response.content  # read the body here so a dropped connection is retried and the connection reused
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            error = FetchError(f"API Error: {response.status_code}", retryable=True)
+            response.close()
+        except requests.exceptions.Timeout:
+            error = FetchError("Request timeout - try a shorter time range", retryable=True)
+        except requests.exceptions.RequestException as e:
+            error = FetchError(f"Connection error: {str(e)}", retryable=True)
+        if attempt == retries:
+            error.exhausted = True
+            raise error
+        delay = retry_delay(attempt, response)
+        if response is not None and response.status_code == 429:
+            pause_requests(delay)
+        time.sleep(delay)
+
+def format_api_time(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def iter_log_records(api_key, profile_id, from_date, to_date, position=None, retries=FETCH_RETRIES):
+    position = {'cursor': None, 'taken': 0} if position is None else position
+
+    while True:
+        skip = position['taken']
+        params = {'limit': PAGE_LIMIT}
+        if from_date:
+            params['from'] = format_api_time(from_date)
+        if to_date:
+            params['to'] = format_api_time(to_date)
+        if position['cursor']:
+            params['cursor'] = position['cursor']
+
+        response = api_get(api_key, f'profiles/{profile_id}/logs', params, retries=retries)
+        try:
+            with response:
+                if response.status_code == 401:
+                    raise FetchError("Invalid API Key")
+                elif response.status_code == 404:
+                    raise FetchError("Profile not found")
+                elif response.status_code != 200:
+                    raise FetchError(f"API Error: {response.status_code}")
+
+                if is_stream(response):
+                    for line in response.iter_lines():
+                        if line.strip():
+                            try:
+                                log_entry = json.loads(line)
+                            except json.JSONDecodeError:
+                                continue
+                            if skip:
+                                skip -= 1
+                                continue
+                            position['taken'] += 1
+                            yield log_entry
+                    return
+
+                try:
+                    data = response.json()
+                except json.JSONDecodeError:
+                    raise FetchError("Invalid response format from API")
+        except requests.exceptions.RequestException as e:
+            raise FetchError(f"Connection error: {str(e)}", retryable=True)
+
+        if isinstance(data, list):
+            logs, cursor = data, None
+        elif isinstance(data, dict):
+            logs = data.get('data', [])
+            cursor = data.get('meta', {}).get('pagination', {}).get('cursor')
+        else:
+            raise FetchError("Unexpected API response format")
+
+        for log in logs[skip:]:
+            position['taken'] += 1
+            yield log
+
+        if not logs or not cursor:
+            return
+        position['cursor'] = cursor
+        position['taken'] = 0
+
+def iter_slice_batches(api_key, profile_id, from_date, to_date, retries=FETCH_RETRIES, batch_size=BATCH_SIZE):
+    position = {'cursor': None, 'taken': 0}
+    batch = []
+    for attempt in range(retries + 1):
+        try:
+            # api_get backs off between failed requests; this loop only resumes from the cursor after a dropped read
+            for log in iter_log_records(api_key, profile_id, from_date, to_date, position, retries):
+                batch.append(log)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+            return
+        except FetchError as e:
+            if not e.retryable or e.exhausted or attempt == retries:
+                raise
+
+def split_time_range(from_date, to_date, workers=FETCH_WORKERS):
+    from_date = from_date.replace(microsecond=0)
+    if to_date.microsecond:
+        to_date = to_date.replace(microsecond=0) + timedelta(seconds=1)
+    span = to_date - from_date
+    slice_size = min(MAX_SLICE, max(MIN_SLICE, span / max(workers, 1)))
+    slice_size = timedelta(seconds=math.ceil(slice_size.total_seconds()))
+
+    slices = []
+    start = from_date
+    while start < to_date:
+        end = min(start + slice_size, to_date)
+        slices.append((start, end))
+        start = end
+    return slices
+
+def stream_logs_by_time(api_key, profile_id, from_date, to_date=None, workers=FETCH_WORKERS,
+                        retries=FETCH_RETRIES, batch_size=BATCH_SIZE):
+    if not from_date:
+        yield from iter_slice_batches(api_key, profile_id, None, to_date, retries, batch_size)
+        return
+
+    to_date = to_date or datetime.now(pytz.UTC)
+    slices = split_time_range(from_date, to_date, workers)
+    workers = max(workers, 1)
+    batches = queue.Queue(maxsize=workers * 2)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(start, end):
+        try:
+            for batch in iter_slice_batches(api_key, profile_id, start, end, retries, batch_size):
+                if not put(batch):
+                    return
+        except Exception as e:
+            put(e)
+        finally:
+            put(None)
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for start, end in reversed(slices):
+            executor.submit(run, start, end)
+        # Batches come out in the order the slices finish them, not by timestamp: normalize_logs sorts the
+        # frame, the stores sort on read and the boundary dedupe counts keys, so nothing downstream relies on it.
+        pending = len(slices)
+        while pending:
+            item = batches.get()
+            if item is None:
+                pending -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def iter_stream_events(api_key, profile_id, last_event_id=None, timeout=STREAM_READ_TIMEOUT):
+    params = {'id': last_event_id} if last_event_id else None
+    response = api_get(api_key, f'profiles/{profile_id}/logs/stream', params, timeout=timeout)
+    try:
+        with response:
+            if response.status_code == 401:
+                raise FetchError("Invalid API Key")
+            elif response.status_code == 404:
+                raise FetchError("Profile not found")
+            elif response.status_code != 200:
+                raise FetchError(f"API Error: {response.status_code}")
+
+            event_id, data = None, []
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    if data:
+                        try:
+                            yield event_id, json.loads('\n'.join(data))
+                        except json.JSONDecodeError:
+                            pass
+                    data = []
+                    continue
+                field, _, value = line.partition(':')
+                value = value[1:] if value.startswith(' ') else value
+                if field == 'id':
+                    event_id = value
+                elif field == 'data':
+                    data.append(value)
+    except requests.exceptions.RequestException as e:
+        raise FetchError(f"Connection error: {str(e)}", retryable=True)
+
+def fetch_analytics(api_key, profile_id, endpoint, params=None):
+    try:
+        response = api_get(api_key, f'profiles/{profile_id}/analytics/{endpoint}', params or {}, timeout=30)
+        if response.status_code == 200:
+            return response.json().get('data', []), None
+        if response.status_code == 401:
+            return None, "Invalid API Key"
+        if response.status_code == 404:
+            return None, "Profile not found"
+        return None, f"API Error: {response.status_code}"
+    except Exception as e:
+        return None, str(e)
+
+def fetch_summary(api_key, profile_id, from_date, to_date):
+    params = {'from': format_api_time(from_date), 'to': format_api_time(to_date)}
+    with ThreadPoolExecutor(max_workers=len(SUMMARY_QUERIES)) as executor:
+        futures = {
+            name: executor.submit(fetch_analytics, api_key, profile_id, endpoint, {**params, **extra})
+            for name, (endpoint, extra) in SUMMARY_QUERIES.items()
+        }
+        results = {name: future.result() for name, future in futures.items()}
+    for _, error in results.values():
+        if error:
+            raise FetchError(error)
+    return {name: data for name, (data, _) in results.items()}
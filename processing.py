@@ -0,0 +1,296 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pytz
+
+GAFAM_DOMAINS = {
+    'google': [
+        'google', 'googleapis', 'gstatic', 'youtube', 'googlevideo', 'ggpht', 
+        'googleusercontent', 'gvt1', 'gvt2', 'gvt3', 'doubleclick', 'googlesyndication', 
+        'googleadservices', 'googleanalytics', 'googletag', 'googleoptimize',
+        'gmail', 'goog', 'chromium', 'android', 'blogger', 'blogspot',
+        'firebase', 'firebaseio', 'googlecloud', 'gcr.io', 'withgoogle',
+        'googleplex', 'googlezip', 'gmodules', 'feedburner', 'admob',
+        'crashlytics', 'appspot', 'googledomains', 'google-analytics',
+        'ytimg', 'yt3.ggpht', 'youtu.be', 'youtube-nocookie'
+    ],
+    'apple': [
+        'apple', 'icloud', 'mzstatic', 'apple-cloudkit', 'cdn-apple',
+        'itunes', 'appstore', 'apple.news', 'apple.com', 'aaplimg',
+        'push.apple', 'siri', 'applemusic', 'icloud-content',
+        'me.com', 'mac.com', 'apple-dns', 'swcdn.apple', 'ls.apple',
+        'gs.apple', 'ess.apple', 'configuration.apple', 'certs.apple',
+        'valid.apple', 'ocsp.apple', 'captive.apple', 'airport.apple'
+    ],
+    'meta': [
+        'facebook', 'fbcdn', 'instagram', 'whatsapp', 'fb.com', 'fb.me',
+        'meta', 'messenger', 'fbsbx', 'facebookcorewwwi', 'accountkit',
+        'oculus', 'workplace', 'fbpigeon', 'facebookmail', 'tfbnw',
+        'fburl', 'cdninstagram', 'threads.net', 'ig.me'
+    ],
+    'amazon': [
+        'amazon', 'amazonaws', 'cloudfront', 'alexa', 'prime',
+        'aws', 'awsstatic', 'elasticbeanstalk', 'elasticache',
+        'amazonvideo', 'amazonpay', 'primevideo', 'twitch', 'twitchcdn',
+        'twitchsvc', 'audible', 'goodreads', 'kindle', 'ring.com',
+        'amazon-adsystem', 'amazonwebservices', 'awscdn', 's3.amazonaws',
+        'ec2.amazonaws', 'media-amazon', 'ssl-images-amazon', 'images-amazon',
+        'fls-na.amazon', 'unagi.amazon', 'device-metrics-us.amazon'
+    ],
+    'microsoft': [
+        'microsoft', 'msn', 'bing', 'azure', 'office', 'live', 'outlook',
+        'skype', 'xbox', 'windows', 'msftconnecttest', 'msedge',
+        'microsoftonline', 'office365', 'sharepoint', 'onedrive', 'onenote',
+        'linkedin', 'licdn', 'github', 'githubusercontent', 'githubassets',
+        'npmjs', 'visualstudio', 'vsassets', 'azureedge', 'trafficmanager',
+        'windowsupdate', 'msauth', 'msftauth', 'msftstatic', 'msecnd',
+        'microsoftstore', 'ms-acdc', 'sfx.ms', 'aka.ms', 'gfx.ms',
+        'c.bing', 's.bing', 'login.live', 'login.microsoftonline',
+        'teams', 'skypeforbusiness', 'lync', 'yammer', 'dynamics',
+        'azure-dns', 'msocsp', 'digicert', 'verisign.net'
+    ]
+}
+
+OTHER_TECH_COMPANIES = {
+    'netflix': ['netflix', 'nflximg', 'nflxvideo', 'nflxext', 'nflxso'],
+    'spotify': ['spotify', 'scdn', 'spotifycdn', 'spotilocal'],
+    'tiktok': ['tiktok', 'tiktokcdn', 'bytedance', 'byteoversea', 'muscdn', 'musical.ly'],
+    'twitter/x': ['twitter', 'twimg', 'x.com', 't.co', 'tweetdeck'],
+    'snapchat': ['snapchat', 'snapkit', 'snap.com', 'snapads'],
+    'adobe': ['adobe', 'typekit', 'adobecc', 'behance', 'adobelogin'],
+    'salesforce': ['salesforce', 'force.com', 'salesforceliveagent', 'sfdc'],
+    'oracle': ['oracle', 'oraclecloud', 'eloqua', 'bluekai', 'grapeshot'],
+    'ibm': ['ibm', 'bluemix', 'softlayer'],
+    'cloudflare': ['cloudflare', 'cloudflare-dns', 'cloudflareresolve', 'cf-ipfs'],
+    'akamai': ['akamai', 'akamaized', 'akamaihd', 'akadns', 'edgekey', 'edgesuite'],
+}
+
+CLASSIFIER_CACHE_SIZE = 200000
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+ENCRYPTED_PROTOCOLS = ['DNS-over-HTTPS', 'DNS-over-TLS', 'DOH', 'DOT']
+DEVICE_FIELDS = ['id', 'name', 'model']
+CATEGORY_COLUMNS = ['status', 'protocol', 'clientIp', 'device.id', 'device.name', 'device.model']
+
+def compile_domain_patterns():
+    owners = {}
+    for companies, is_gafam in ((GAFAM_DOMAINS, True), (OTHER_TECH_COMPANIES, False)):
+        for company, patterns in companies.items():
+            for pattern in patterns:
+                owners.setdefault(pattern, (len(owners), company.capitalize(), is_gafam))
+    ordered = sorted(owners, key=lambda pattern: owners[pattern][0])
+    regex = re.compile('(?=(' + '|'.join(re.escape(pattern) for pattern in ordered) + '))')
+    return regex, owners
+
+DOMAIN_PATTERN, PATTERN_OWNERS = compile_domain_patterns()
+
+@lru_cache(maxsize=CLASSIFIER_CACHE_SIZE)
+def classify_domain(domain):
+    if not domain:
+        return 'Others', 'Others'
+    best = None
+    for match in DOMAIN_PATTERN.finditer(domain.lower()):
+        owner = PATTERN_OWNERS[match.group(1)]
+        if best is None or owner[0] < best[0]:
+            best = owner
+    if best is None:
+        return 'Others', 'Others'
+    _, company, is_gafam = best
+    return (company if is_gafam else 'Others'), company
+
+def classify_gafam(domain):
+    return classify_domain(domain)[0]
+
+def classify_all_tech(domain):
+    return classify_domain(domain)[1]
+
+def labels_to_categorical(codes, labels, fill):
+    label_codes, categories = pd.factorize(np.array(list(labels) + [fill], dtype=object))
+    return pd.Categorical.from_codes(label_codes[codes], categories)
+
+def categorize(values, func, fill):
+    codes, uniques = pd.factorize(values)
+    return labels_to_categorical(codes, [func(value) for value in uniques], fill)
+
+def constant_category(index, value):
+    return pd.Series(pd.Categorical.from_codes(np.zeros(len(index), dtype='int8'), [value]), index=index)
+
+def classify_domain_codes(codes, uniques):
+    labels = [classify_domain(domain) for domain in uniques]
+    gafam = labels_to_categorical(codes, [label[0] for label in labels], 'Others')
+    all_tech = labels_to_categorical(codes, [label[1] for label in labels], 'Others')
+    return gafam, all_tech
+
+def classify_domains(domains):
+    return classify_domain_codes(*pd.factorize(domains))
+
+def extract_root_domain(domain):
+    if not domain:
+        return ''
+    parts = domain.split('.')
+    if len(parts) >= 2:
+        return '.'.join(parts[-2:])
+    return domain
+
+def device_label(value):
+    if isinstance(value, dict):
+        return value.get('name', 'Unknown')
+    return str(value) if value else 'Unknown'
+
+def flatten_devices(frame):
+    if 'device' not in frame.columns:
+        return frame
+    devices = frame.pop('device')
+    for field in DEVICE_FIELDS:
+        frame[f'device.{field}'] = [device.get(field) if isinstance(device, dict) else None for device in devices]
+    return frame
+
+def compact_frame(frame):
+    for col in CATEGORY_COLUMNS:
+        if col in frame.columns and frame[col].dtype == object:
+            frame[col] = frame[col].astype('category')
+    if 'domain' in frame.columns and frame['domain'].dtype == object:
+        codes, uniques = pd.factorize(frame['domain'])
+        frame['domain'] = np.append(uniques.astype(object), None)[codes]
+    return frame
+
+def logs_to_frame(batches):
+    frames = [flatten_devices(pd.DataFrame(batch)) for batch in batches if batch]
+    if not frames:
+        return pd.DataFrame()
+    return compact_frame(pd.concat(frames, ignore_index=True))
+
+def dataset_fingerprint(frame):
+    if frame is None or frame.empty:
+        return 'empty'
+    columns = [col for col in ('timestamp', 'domain') if col in frame.columns]
+    hashed = pd.util.hash_pandas_object(frame[columns], index=False).to_numpy() if columns else np.zeros(0, dtype='uint64')
+    return f'{len(frame)}:{int(hashed.sum()):016x}'
+
+def normalize_logs(logs):
+    if logs is None or len(logs) == 0:
+        return pd.DataFrame()
+
+    df = logs.copy(deep=False) if isinstance(logs, pd.DataFrame) else logs_to_frame([logs])
+
+    timestamp_col = None
+    for col in ['timestamp', 'time', 'date', 'ts']:
+        if col in df.columns:
+            timestamp_col = col
+            break
+
+    if timestamp_col:
+        df['timestamp'] = pd.to_datetime(df[timestamp_col], errors='coerce', utc=True)
+    else:
+        df['timestamp'] = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns, UTC]')
+
+    if 'status' in df.columns:
+        df['is_blocked'] = categorize(df['status'], lambda x: 'Blocked' if str(x).lower() == 'blocked' else 'Allowed', 'Allowed')
+    else:
+        df['is_blocked'] = constant_category(df.index, 'Allowed')
+
+    domain_col = None
+    for col in ['domain', 'name', 'query', 'qname']:
+        if col in df.columns:
+            domain_col = col
+            break
+
+    if domain_col:
+        df['domain'] = df[domain_col].fillna('')
+        codes, uniques = pd.factorize(df['domain'])
+        df['root_domain'] = np.array([extract_root_domain(domain) for domain in uniques] + [''], dtype=object)[codes]
+        df['gafam'], df['all_tech'] = classify_domain_codes(codes, uniques)
+    else:
+        df['domain'] = ''
+        df['root_domain'] = ''
+        df['all_tech'] = constant_category(df.index, 'Others')
+        df['gafam'] = constant_category(df.index, 'Others')
+
+    if 'device.name' in df.columns:
+        df['device_name'] = categorize(df['device.name'], str, 'Unknown')
+    elif 'device' in df.columns:
+        df['device_name'] = df['device'].apply(device_label).astype('category')
+    elif 'deviceName' in df.columns:
+        df['device_name'] = categorize(df['deviceName'], str, 'Unknown')
+    elif 'client' in df.columns:
+        df['device_name'] = df['client'].apply(device_label).astype('category')
+    else:
+        df['device_name'] = constant_category(df.index, 'Unknown')
+
+    if 'protocol' in df.columns:
+        df['protocol'] = df['protocol'].astype('category')
+        df['is_encrypted'] = df['protocol'].isin(ENCRYPTED_PROTOCOLS)
+    else:
+        df['protocol'] = constant_category(df.index, 'Unknown')
+        df['is_encrypted'] = False
+
+    return sort_by_time(df)
+
+def sort_by_time(df):
+    if df['timestamp'].is_monotonic_increasing:
+        return df.reset_index(drop=True)
+    return df.sort_values('timestamp', kind='stable', na_position='last', ignore_index=True)
+
+def valid_rows(frame):
+    return int(frame['timestamp'].searchsorted(pd.NaT))
+
+def time_rows(frame, start=None, end=None):
+    timestamps = frame['timestamp']
+    lo = int(timestamps.searchsorted(start)) if start is not None else 0
+    hi = int(timestamps.searchsorted(end)) if end is not None else valid_rows(frame)
+    return lo, hi
+
+def time_slice(frame, start=None, end=None):
+    lo, hi = time_rows(frame, start, end)
+    return frame.iloc[lo:hi]
+
+def value_ranks(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        ranks = np.argsort(np.argsort(values.cat.categories.astype(str), kind='stable'))
+        codes = values.cat.codes.to_numpy()
+        return np.where(codes >= 0, ranks[np.maximum(codes, 0)], -1)
+    return pd.factorize(values, sort=True)[0]
+
+def sorted_rows(frame, column='timestamp', descending=True):
+    valid = valid_rows(frame)
+    if column == 'timestamp':
+        return np.r_[valid - 1:-1:-1, valid:len(frame)] if descending else np.arange(len(frame))
+    rows = np.r_[valid - 1:-1:-1, valid:len(frame)]
+    ranks = value_ranks(frame[column])[rows]
+    keys = np.where(ranks < 0, np.iinfo(np.int64).max, -ranks if descending else ranks)
+    return rows[np.argsort(keys, kind='stable')]
+
+def time_bounds(frame):
+    if 'timestamp' not in frame.columns:
+        return None, None
+    end = valid_rows(frame)
+    if end == 0:
+        return None, None
+    return frame['timestamp'].iloc[0], frame['timestamp'].iloc[end - 1]
+
+def localize_logs(normalized, timezone_str='Europe/Berlin'):
+    if normalized.empty:
+        return normalized
+
+    df = normalized.copy(deep=False)
+
+    if df['timestamp'].notna().any():
+        try:
+            df['timestamp'] = df['timestamp'].dt.tz_convert(pytz.timezone(timezone_str))
+        except Exception:
+            pass
+        df['hour'] = df['timestamp'].dt.hour
+        day_codes = df['timestamp'].dt.dayofweek.fillna(-1).astype('int8')
+        df['day_of_week'] = pd.Categorical.from_codes(day_codes, DAY_NAMES)
+        date_codes, dates = pd.factorize(df['timestamp'].dt.normalize())
+        df['date'] = pd.Categorical.from_codes(date_codes, dates.date)
+    else:
+        df['hour'] = 0
+        df['day_of_week'] = constant_category(df.index, 'Unknown')
+        df['date'] = None
+
+    return df
+
+def process_logs(logs, timezone_str='Europe/Berlin'):
+    return localize_logs(normalize_logs(logs), timezone_str)
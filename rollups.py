@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+from processing import DAY_NAMES, logs_to_frame, normalize_logs, time_slice
+
+TICK_FREQ = '5min'
+TICK_SPAN = pd.Timedelta(days=1)
+TIMELINE_FREQ = 'h'
+BREAKDOWN_FREQ = 'D'
+ROLLUPS = {
+    'ticks': (TICK_FREQ, ['is_blocked']),
+    'timeline': (TIMELINE_FREQ, ['is_blocked', 'gafam']),
+    'breakdown': (BREAKDOWN_FREQ, ['is_blocked', 'device_name', 'root_domain', 'gafam', 'all_tech']),
+    'protocols': (BREAKDOWN_FREQ, ['device_name', 'protocol']),
+}
+SUMMARY_ROLLUPS = ['ticks', 'timeline', 'protocols']
+
+def empty_rollup(name):
+    frame = pd.DataFrame({key: pd.Series(dtype=object) for key in ROLLUPS[name][1]})
+    frame.insert(0, 'bucket', pd.Series(dtype='datetime64[ns, UTC]'))
+    frame['queries'] = pd.Series(dtype='int64')
+    return frame
+
+def rollup(frame, name):
+    freq, keys = ROLLUPS[name]
+    if frame.empty or 'timestamp' not in frame.columns:
+        return empty_rollup(name)
+    frame = frame[frame['timestamp'].notna()]
+    if frame.empty:
+        return empty_rollup(name)
+    bucket = frame['timestamp'].dt.tz_convert('UTC').dt.floor(freq).rename('bucket')
+    counts = frame.groupby([bucket, *[frame[key] for key in keys]], observed=True, dropna=False).size()
+    return counts.reset_index(name='queries')
+
+def build_rollups(frame):
+    return {name: rollup(frame, name) for name in ROLLUPS}
+
+def rollups_from_logs(logs):
+    return build_rollups(normalize_logs(logs_to_frame([logs])))
+
+def merge_tables(name, tables):
+    tables = [table for table in tables if table is not None and not table.empty]
+    if not tables:
+        return empty_rollup(name)
+    if len(tables) == 1:
+        return tables[0]
+    combined = pd.concat([table.astype({key: object for key in ROLLUPS[name][1]}) for table in tables], ignore_index=True)
+    keys = ['bucket', *ROLLUPS[name][1]]
+    return combined.groupby(keys, dropna=False)['queries'].sum().reset_index()
+
+def merge_rollups(*parts):
+    return {name: merge_tables(name, [part[name] for part in parts]) for name in ROLLUPS}
+
+def bucket_start(value, freq):
+    return pd.Timestamp(value).tz_convert('UTC').floor(freq)
+
+def trim_rollups(rollups, since):
+    return {
+        name: table[table['bucket'] >= bucket_start(since, ROLLUPS[name][0])]
+        for name, table in rollups.items()
+    }
+
+def ticks_since(since, latest):
+    if latest is None:
+        return since
+    start = bucket_start(latest, TICK_FREQ) - TICK_SPAN
+    return start if since is None or start > since else since
+
+def recent_ticks(rollups):
+    ticks = rollups.get('ticks')
+    if ticks is None or ticks.empty:
+        return rollups
+    return {**rollups, 'ticks': ticks[ticks['bucket'] >= ticks_since(None, ticks['bucket'].max())]}
+
+def window_boundary(cutoff, freq):
+    return pd.Timestamp(cutoff).tz_convert('UTC').ceil(freq)
+
+def window_head_end(cutoff):
+    return max(window_boundary(cutoff, freq) for freq, _ in ROLLUPS.values())
+
+def window_rollups(rollups, frame, cutoff):
+    if cutoff is None:
+        return rollups
+    cutoff = pd.Timestamp(cutoff).tz_convert('UTC')
+    windowed = {}
+    for name, (freq, _) in ROLLUPS.items():
+        boundary = window_boundary(cutoff, freq)
+        table = rollups[name]
+        head = time_slice(frame, cutoff, boundary) if not frame.empty else frame
+        windowed[name] = merge_tables(name, [table[table['bucket'] >= boundary], rollup(head, name)])
+    return windowed
+
+def coarsen_rollup(table, freq, keys):
+    bucket = table['bucket'].dt.floor(freq).rename('bucket')
+    return table.groupby([bucket, *[table[key] for key in keys]], observed=True)['queries'].sum().reset_index()
+
+def heatmap_matrix(local_table):
+    matrix = np.zeros((len(DAY_NAMES), 24), dtype=np.int64)
+    np.add.at(matrix, (local_table['day_of_week'].cat.codes.to_numpy(), local_table['hour'].to_numpy()), local_table['queries'].to_numpy())
+    return matrix
+
+def rollup_counts(table, column):
+    counts = table.groupby(column, observed=True)['queries'].sum()
+    return counts[counts > 0].sort_values(ascending=False, kind='stable')
+
+def rollup_total(table):
+    return int(table['queries'].sum())
+
+def localize_rollup(table, timezone_str):
+    local = table.copy()
+    try:
+        local['bucket'] = local['bucket'].dt.tz_convert(timezone_str)
+    except Exception:
+        pass
+    local['hour'] = local['bucket'].dt.hour
+    local['day_of_week'] = pd.Categorical.from_codes(local['bucket'].dt.dayofweek.astype('int8'), DAY_NAMES)
+    return local
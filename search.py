@@ -0,0 +1,59 @@
+import re
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+GRAM = 3
+WILDCARDS = re.compile(r'[*?]')
+
+def domain_grams(domain):
+    return {domain[i:i + GRAM] for i in range(len(domain) - GRAM + 1)}
+
+def build_search_index(domains):
+    codes, uniques = pd.factorize(domains.fillna('').astype(str).str.lower())
+    postings = defaultdict(list)
+    for domain_id, domain in enumerate(uniques):
+        for gram in domain_grams(domain):
+            postings[gram].append(domain_id)
+    counts = np.bincount(codes, minlength=len(uniques))
+    return {
+        'domains': np.asarray(uniques, dtype=object),
+        'grams': {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()},
+        'rows': np.argsort(codes, kind='stable'),
+        'offsets': np.concatenate([[0], np.cumsum(counts)]),
+    }
+
+def glob_pattern(term):
+    return re.compile(''.join('.*' if char == '*' else '.' if char == '?' else re.escape(char) for char in term))
+
+def candidate_domains(index, literals):
+    grams = {gram for literal in literals for gram in domain_grams(literal)}
+    if not grams:
+        return np.arange(len(index['domains']))
+    postings = sorted((index['grams'].get(gram, np.empty(0, dtype=np.int32)) for gram in grams), key=len)
+    candidates = postings[0]
+    for ids in postings[1:]:
+        if len(candidates) == 0:
+            break
+        candidates = np.intersect1d(candidates, ids, assume_unique=True)
+    return candidates
+
+def match_domains(index, term):
+    term = term.strip().lower()
+    domains = index['domains']
+    if WILDCARDS.search(term):
+        pattern = glob_pattern(term)
+        candidates = candidate_domains(index, WILDCARDS.split(term))
+        return np.array([i for i in candidates if pattern.fullmatch(domains[i])], dtype=np.int64)
+    candidates = candidate_domains(index, [term])
+    return np.array([i for i in candidates if term in domains[i]], dtype=np.int64)
+
+def search_rows(index, term, start=0, stop=None):
+    domain_ids = match_domains(index, term)
+    starts = index['offsets'][domain_ids]
+    lengths = index['offsets'][domain_ids + 1] - starts
+    positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+    rows = np.sort(index['rows'][positions])
+    lo, hi = rows.searchsorted([start, len(index['rows']) if stop is None else stop])
+    return rows[lo:hi]
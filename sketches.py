@@ -0,0 +1,145 @@
+import base64
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from rollups import BREAKDOWN_FREQ, window_boundary
+
+SKETCH_CAPACITY = int(os.environ.get('NEXTDNS_SKETCH_CAPACITY', '500'))
+HLL_PRECISION = 12
+TOP_K_SKETCHES = {
+    'allowed_domains': 'root_domain',
+    'blocked_domains': 'root_domain',
+    'domains': 'root_domain',
+    'devices': 'device_name',
+    'blocked_devices': 'device_name',
+    'tech': 'all_tech',
+}
+DISTINCT_SKETCHES = {
+    'unique_domains': 'root_domain',
+    'unique_devices': 'device_name',
+}
+COMPANY_PREFIX = 'company:'
+DEVICE_PREFIX = 'device:'
+BLOCKED_DEVICE_PREFIX = 'device_blocked:'
+DEVICE_PREFIXES = (DEVICE_PREFIX, BLOCKED_DEVICE_PREFIX)
+GROUPED_SKETCHES = {
+    COMPANY_PREFIX: ('domains', 'gafam'),
+    DEVICE_PREFIX: ('domains', 'device_name'),
+    BLOCKED_DEVICE_PREFIX: ('blocked_domains', 'device_name'),
+}
+
+def empty_top_k():
+    return {'counts': pd.Series(dtype='int64'), 'floor': 0}
+
+def top_k_summary(counts, capacity=SKETCH_CAPACITY):
+    counts = counts[counts > 0]
+    counts.index = counts.index.astype(object)
+    counts = counts.sort_index().sort_values(ascending=False, kind='stable')
+    floor = int(counts.iloc[capacity]) if len(counts) > capacity else 0
+    return {'counts': counts.head(capacity).astype('int64'), 'floor': floor}
+
+def merge_top_k(summaries, capacity=SKETCH_CAPACITY):
+    summaries = [summary for summary in summaries if len(summary['counts'])]
+    if not summaries:
+        return empty_top_k()
+    if len(summaries) == 1:
+        return summaries[0]
+    counts = pd.concat([summary['counts'] for summary in summaries]).groupby(level=0).sum()
+    counts = counts.sort_values(ascending=False, kind='stable')
+    dropped = int(counts.iloc[capacity]) if len(counts) > capacity else 0
+    return {'counts': counts.head(capacity), 'floor': sum(summary['floor'] for summary in summaries) + dropped}
+
+def hash_values(values):
+    return pd.util.hash_array(np.asarray(values, dtype=object).astype(str))
+
+def hll_registers(values, precision=HLL_PRECISION):
+    registers = np.zeros(1 << precision, dtype=np.uint8)
+    hashes = hash_values(pd.unique(np.asarray(values, dtype=object)))
+    if not len(hashes):
+        return registers
+    index = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    rest = (hashes & np.uint64((1 << (64 - precision)) - 1)).astype(np.float64)
+    bit_length = np.where(rest > 0, np.frexp(rest)[1], 0)
+    np.maximum.at(registers, index, (64 - precision - bit_length + 1).astype(np.uint8))
+    return registers
+
+def merge_hll(registers):
+    registers = list(registers)
+    if not registers:
+        return np.zeros(1 << HLL_PRECISION, dtype=np.uint8)
+    return np.maximum.reduce(registers)
+
+def hll_estimate(registers):
+    size = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / size)
+    estimate = alpha * size * size / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * size and zeros:
+        estimate = size * np.log(size / zeros)
+    return int(round(estimate))
+
+def partition_sketches(breakdown):
+    blocked = (breakdown['is_blocked'] == 'Blocked').to_numpy()
+    rows = {
+        'allowed_domains': breakdown[~blocked], 'blocked_domains': breakdown[blocked], 'domains': breakdown,
+        'devices': breakdown, 'blocked_devices': breakdown[blocked], 'tech': breakdown,
+    }
+    sketches = {
+        name: top_k_summary(rows[name].groupby(column, observed=True)['queries'].sum())
+        for name, column in TOP_K_SKETCHES.items()
+    }
+    for prefix, (name, column) in GROUPED_SKETCHES.items():
+        grouped_counts = rows[name].groupby([column, 'root_domain'], observed=True)['queries'].sum()
+        for key, counts in grouped_counts.groupby(level=column, observed=True, sort=False):
+            sketches[prefix + str(key)] = top_k_summary(counts.droplevel(column))
+    for name, column in DISTINCT_SKETCHES.items():
+        sketches[name] = hll_registers(breakdown[column])
+    return sketches
+
+def build_sketches(breakdown):
+    breakdown = breakdown[breakdown['queries'] > 0]
+    return {bucket: partition_sketches(rows) for bucket, rows in breakdown.groupby('bucket', sort=True)}
+
+def merge_sketches(parts, names=None):
+    parts = list(parts)
+    if names is None:
+        names = dict.fromkeys(name for part in parts for name in part)
+    return {
+        name: merge_hll(part[name] for part in parts if name in part) if name in DISTINCT_SKETCHES
+        else merge_top_k([part[name] for part in parts if name in part])
+        for name in names
+    }
+
+def window_sketches(day_sketches, breakdown, cutoff):
+    if cutoff is None:
+        return list(day_sketches.values())
+    boundary = window_boundary(cutoff, BREAKDOWN_FREQ)
+    head = build_sketches(breakdown[breakdown['bucket'] < boundary])
+    return [*(sketches for day, sketches in day_sketches.items() if day >= boundary), *head.values()]
+
+def encode_sketch(name, sketch):
+    if name in DISTINCT_SKETCHES:
+        return json.dumps({'registers': base64.b64encode(sketch.tobytes()).decode('ascii')})
+    counts = sketch['counts']
+    return json.dumps({'items': [str(item) for item in counts.index], 'counts': counts.tolist(), 'floor': sketch['floor']})
+
+def decode_sketch(name, data):
+    value = json.loads(data)
+    if name in DISTINCT_SKETCHES:
+        return np.frombuffer(base64.b64decode(value['registers']), dtype=np.uint8).copy()
+    return {'counts': pd.Series(value['counts'], index=value['items'], dtype='int64'), 'floor': value['floor']}
+
+def sketch_rows(day_sketches):
+    return [
+        (day, name, encode_sketch(name, sketch))
+        for day, sketches in day_sketches.items() for name, sketch in sketches.items()
+    ]
+
+def sketches_from_rows(rows):
+    day_sketches = {}
+    for day, name, data in rows:
+        day_sketches.setdefault(pd.to_datetime(day, utc=True), {})[name] = decode_sketch(name, data)
+    return day_sketches
@@ -0,0 +1,206 @@
+import fcntl
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+import pytz
+from sqlalchemy.exc import SQLAlchemyError
+
+import nextdns_api
+from database import (
+    format_log_timestamp, load_credentials_db, load_log_stats_db, load_logs_db, load_rollups_db, load_sketches_db,
+    load_sync_boundary_db, parse_log_timestamp, sqlite_database, store_log_batches_db
+)
+from local_store import (
+    STORE_DIR, StoreError, load_log_stats_local, load_logs_local, load_rollups_local, load_sketches_local,
+    load_sync_boundary_local, store_log_batches_local
+)
+from processing import logs_to_frame
+
+SYNC_DIR = os.environ.get('NEXTDNS_SYNC_DIR', 'nextdns_sync')
+PROFILE_WORKERS = int(os.environ.get('NEXTDNS_PROFILE_WORKERS', '4'))
+STATUS_WRITE_INTERVAL = 2.0
+CREDENTIALS_FILE = 'nextdns_credentials.json'
+STORAGE_BACKENDS = {
+    'database': (
+        store_log_batches_db, load_logs_db, load_log_stats_db, load_rollups_db, load_sync_boundary_db, load_sketches_db
+    ),
+    'local store': (
+        store_log_batches_local, load_logs_local, load_log_stats_local, load_rollups_local, load_sync_boundary_local,
+        load_sketches_local
+    ),
+}
+
+logger = logging.getLogger('nextdns_sync')
+
+class SyncBusyError(Exception):
+    pass
+
+SYNC_ERRORS = (SyncBusyError, nextdns_api.FetchError, SQLAlchemyError, StoreError)
+
+def select_storage(db_initialized):
+    if db_initialized:
+        return 'database'
+    if STORE_DIR:
+        return 'local store'
+    return None
+
+def parse_profiles(value):
+    return list(dict.fromkeys(profile.strip() for profile in value.split(',') if profile.strip()))
+
+def load_credentials():
+    try:
+        with open(CREDENTIALS_FILE, 'r') as f:
+            saved = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'api_key': '', 'profiles': []}
+    if 'profiles' not in saved:
+        saved['profiles'] = [saved['profile_id']] if saved.get('profile_id') else []
+    return saved
+
+def save_credentials(api_key, profile_ids):
+    with open(CREDENTIALS_FILE, 'w') as f:
+        json.dump({'api_key': api_key, 'profiles': list(profile_ids)}, f)
+
+def load_saved_credentials(db_initialized):
+    saved = load_credentials_db() if db_initialized else {}
+    if saved.get('api_key') and saved.get('profiles'):
+        return saved
+    return load_credentials()
+
+def log_identity(log):
+    device = log.get('device')
+    device_id = device.get('id') if isinstance(device, dict) else device or log.get('device.id')
+    return (parse_log_timestamp(log.get('timestamp')), log.get('domain'), device_id, log.get('clientIp'), log.get('status'))
+
+def drop_boundary_duplicates(logs, seen):
+    fresh = []
+    for log in logs:
+        key = log_identity(log)
+        if seen[key] > 0:
+            seen[key] -= 1
+            continue
+        fresh.append(log)
+    return fresh
+
+def sync_boundary_from_logs(logs):
+    if logs is None or logs.empty or 'timestamp' not in logs.columns:
+        return None, []
+    latest = logs['timestamp'].dropna().max()
+    if pd.isna(latest):
+        return None, []
+    boundary_start = parse_log_timestamp(latest).replace(microsecond=0)
+    boundary = logs[logs['timestamp'] >= format_log_timestamp(boundary_start)].astype(object)
+    return boundary_start, boundary.where(boundary.notna(), None).to_dict('records')
+
+def sync_path(profile_id, suffix):
+    return os.path.join(SYNC_DIR, f"{re.sub(r'[^A-Za-z0-9_-]', '_', profile_id)}.{suffix}")
+
+@contextmanager
+def sync_lock(profile_id):
+    os.makedirs(SYNC_DIR, exist_ok=True)
+    with open(sync_path(profile_id, 'lock'), 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise SyncBusyError(f"A sync for profile {profile_id} is already running") from None
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def load_sync_status(profile_id):
+    try:
+        with open(sync_path(profile_id, 'json'), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def save_sync_status(profile_id, status):
+    os.makedirs(SYNC_DIR, exist_ok=True)
+    path = sync_path(profile_id, 'json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(status, f)
+    os.replace(path + '.tmp', path)
+
+def sync_profile(api_key, profile_id, storage, time_range, from_date, to_date, incremental=True):
+    store_log_batches, _, _, _, load_sync_boundary, _ = STORAGE_BACKENDS[storage]
+    with sync_lock(profile_id):
+        fetch_from = from_date
+        boundary_logs = []
+        if incremental:
+            latest, boundary_logs = load_sync_boundary(profile_id)
+            if latest and latest > from_date:
+                fetch_from = latest
+            else:
+                boundary_logs = []
+        previous = load_sync_status(profile_id) or {}
+        status = {
+            'state': 'running',
+            'time_range': time_range,
+            'from_ts': fetch_from.isoformat(),
+            'to_ts': to_date.isoformat(),
+            'started_at': datetime.now(pytz.UTC).isoformat(),
+            'rows': 0,
+            'last_success_at': previous.get('last_success_at'),
+        }
+        save_sync_status(profile_id, status)
+        batches = nextdns_api.stream_logs_by_time(api_key, profile_id, fetch_from, to_date)
+        if boundary_logs:
+            boundary_counter = Counter(log_identity(log) for log in boundary_logs)
+            batches = (drop_boundary_duplicates(batch, boundary_counter) for batch in batches)
+        replace = fetch_from == from_date
+        written_at = time.monotonic()
+        try:
+            for batch in store_log_batches(profile_id, batches, time_range, fetch_from, to_date, replace=replace):
+                status['rows'] += len(batch)
+                if time.monotonic() - written_at >= STATUS_WRITE_INTERVAL:
+                    save_sync_status(profile_id, status)
+                    written_at = time.monotonic()
+        except Exception as e:
+            status.update(state='error', error=str(e), finished_at=datetime.now(pytz.UTC).isoformat())
+            save_sync_status(profile_id, status)
+            raise
+        finished_at = datetime.now(pytz.UTC).isoformat()
+        status.update(state='done', finished_at=finished_at, last_success_at=finished_at)
+        save_sync_status(profile_id, status)
+        return status['rows'], fetch_from
+
+def fetch_profile_logs(api_key, profile_id, from_date, to_date, logs=None):
+    fetch_from = from_date
+    latest, boundary_logs = sync_boundary_from_logs(logs)
+    if latest and latest > from_date:
+        fetch_from = latest
+    batches = nextdns_api.stream_logs_by_time(api_key, profile_id, fetch_from, to_date)
+    if fetch_from != from_date:
+        boundary_counter = Counter(log_identity(log) for log in boundary_logs)
+        batches = (drop_boundary_duplicates(batch, boundary_counter) for batch in batches)
+    return logs_to_frame(batches), fetch_from
+
+def run_profiles(func, profile_ids, workers=PROFILE_WORKERS):
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(profile_ids)))) as executor:
+        futures = {profile_id: executor.submit(func, profile_id) for profile_id in profile_ids}
+        for profile_id, future in futures.items():
+            try:
+                results[profile_id] = future.result(), None
+            except SYNC_ERRORS as e:
+                results[profile_id] = None, e
+            except Exception as e:
+                logger.exception('%s: unexpected error', profile_id)
+                results[profile_id] = None, e
+    return results
+
+def sync_profiles(api_key, profile_ids, storage, time_range, from_date, to_date, incremental=True):
+    workers = 1 if storage == 'database' and sqlite_database() else PROFILE_WORKERS
+    return run_profiles(
+        lambda profile_id: sync_profile(api_key, profile_id, storage, time_range, from_date, to_date, incremental),
+        profile_ids, workers
+    )
@@ -0,0 +1,229 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from processing import DAY_NAMES, ENCRYPTED_PROTOCOLS
+from rollups import (
+    TICK_SPAN, coarsen_rollup, heatmap_matrix, localize_rollup, merge_rollups, rollup_counts, rollup_total, window_rollups
+)
+from search import search_rows
+from sketches import BLOCKED_DEVICE_PREFIX, COMPANY_PREFIX, DEVICE_PREFIX, DEVICE_PREFIXES, hll_estimate, merge_sketches
+
+ALL_PROFILES = 'All Profiles'
+COMPANIES = ['Google', 'Apple', 'Meta', 'Amazon', 'Microsoft']
+EXPLORER_COLUMNS = {
+    'timestamp': 'Timestamp',
+    'domain': 'Domain',
+    'device_name': 'Device',
+    'protocol': 'Protocol',
+    'is_blocked': 'Status',
+}
+BLOCKED_STYLE = 'background-color: rgba(239, 68, 68, 0.3)'
+ENCRYPTED_STYLE = 'background-color: rgba(34, 197, 94, 0.2)'
+VIEWS = ["📈 Time Analysis", "🔥 Heatmap", "📱 Device Forensics", "🏢 GAFAM Analysis", "📋 Log Explorer"]
+
+def split_by(counts, level):
+    return {key: group.droplevel(level) for key, group in counts.groupby(level=level, observed=True, sort=False)}
+
+def dashboard_view(rollups, frame, cutoff, timezone_str, exact=True):
+    windowed = window_rollups(rollups, frame, cutoff)
+    timeline = windowed['timeline']
+    breakdown = windowed['breakdown']
+    view = {
+        'timeline': timeline,
+        'local_timeline': localize_rollup(timeline, timezone_str),
+        'ticks': windowed['ticks'],
+        'timezone': timezone_str,
+        'protocols': windowed['protocols'],
+        'total_queries': rollup_total(timeline),
+        'blocked_queries': rollup_total(timeline[timeline['is_blocked'] == 'Blocked']),
+    }
+    if not exact:
+        view['head_breakdown'] = breakdown
+        return view
+    blocked = breakdown['is_blocked'] == 'Blocked'
+    view['breakdown'] = breakdown
+    view['blocked_breakdown'] = breakdown[blocked]
+    view['allowed_breakdown'] = breakdown[~blocked]
+    view['device_counts'] = rollup_counts(breakdown, 'device_name')
+    view['blocked_domain_counts'] = rollup_counts(view['blocked_breakdown'], 'root_domain')
+    return view
+
+def profiles_view(parts, timezone_str, exact=True):
+    return dashboard_view(merge_rollups(*parts), pd.DataFrame(), None, timezone_str, exact)
+
+def sketch_counts(sketches, name):
+    counts = sketches[name]['counts'] if name in sketches else pd.Series(dtype='int64')
+    return counts[counts > 0]
+
+def device_sketch_counts(view, prefix, device):
+    name = prefix + str(device)
+    return sketch_counts(merge_sketches(view['day_sketches'], [name]), name)
+
+def approximate_view(view, day_sketches):
+    names = [
+        name for name in dict.fromkeys(name for sketches in day_sketches for name in sketches)
+        if not name.startswith(DEVICE_PREFIXES)
+    ]
+    sketches = merge_sketches(day_sketches, names)
+    view = dict(view)
+    view['day_sketches'] = day_sketches
+    view['device_counts'] = sketch_counts(sketches, 'devices')
+    view['blocked_device_counts'] = sketch_counts(sketches, 'blocked_devices')
+    view['domain_counts'] = sketch_counts(sketches, 'domains')
+    view['blocked_domain_counts'] = sketch_counts(sketches, 'blocked_domains')
+    view['allowed_domain_counts'] = sketch_counts(sketches, 'allowed_domains')
+    view['tech_counts'] = sketch_counts(sketches, 'tech')
+    view['company_domain_counts'] = {
+        name[len(COMPANY_PREFIX):]: sketch_counts(sketches, name) for name in sketches if name.startswith(COMPANY_PREFIX)
+    }
+    view['unique_domains'] = hll_estimate(sketches['unique_domains']) if 'unique_domains' in sketches else 0
+    view['unique_devices'] = hll_estimate(sketches['unique_devices']) if 'unique_devices' in sketches else 0
+    return view
+
+def timeline_bounds(view):
+    buckets = view['local_timeline']['bucket']
+    if buckets.empty:
+        return None, None
+    return buckets.min(), buckets.max()
+
+def time_view(view, min_time, max_time):
+    time_diff = max_time - min_time
+    ticks = view['ticks']
+    if time_diff <= TICK_SPAN and not ticks.empty and ticks['bucket'].min() <= min_time:
+        table = localize_rollup(ticks, view['timezone'])
+        bucket = '5min' if time_diff <= timedelta(hours=6) else '15min'
+    else:
+        table, bucket = view['local_timeline'], 'h' if time_diff <= timedelta(days=3) else '3h'
+    time_series = coarsen_rollup(table, bucket, ['is_blocked']).rename(columns={'bucket': 'time_bucket', 'queries': 'count'})
+    return {
+        'time_series': time_series,
+        'allowed_domains': (
+            view['allowed_domain_counts'] if 'allowed_domain_counts' in view
+            else rollup_counts(view['allowed_breakdown'], 'root_domain')
+        ).head(10),
+        'blocked_domains': view['blocked_domain_counts'].head(10),
+    }
+
+def live_time_series(minutes, timezone_str):
+    series = minutes.rename(columns={'bucket': 'time_bucket', 'queries': 'count'})
+    try:
+        series['time_bucket'] = series['time_bucket'].dt.tz_convert(timezone_str)
+    except Exception:
+        pass
+    return series
+
+def heatmap_view(view):
+    matrix = heatmap_matrix(view['local_timeline'])
+    hourly_counts = pd.Series(matrix.sum(axis=0))
+    daily_counts = pd.Series(matrix.sum(axis=1), index=DAY_NAMES)
+    return {
+        'heatmap': pd.DataFrame(matrix, index=DAY_NAMES, columns=range(24)),
+        'hourly_counts': hourly_counts[hourly_counts > 0].sort_values(ascending=False, kind='stable').head(5),
+        'daily_counts': daily_counts[daily_counts > 0].sort_values(ascending=False, kind='stable').head(5),
+    }
+
+def approximate_device_view(view, device):
+    if device is None:
+        return {
+            'total': view['total_queries'],
+            'blocked': view['blocked_queries'],
+            'top_domains': view['domain_counts'].head(10),
+            'blocked_domains': view['blocked_domain_counts'].head(10),
+            'protocol_counts': rollup_counts(view['protocols'], 'protocol'),
+        }
+    protocols = view['protocols'][view['protocols']['device_name'] == device]
+    return {
+        'total': rollup_total(protocols),
+        'blocked': int(view['blocked_device_counts'].get(device, 0)),
+        'top_domains': device_sketch_counts(view, DEVICE_PREFIX, device).head(10),
+        'blocked_domains': device_sketch_counts(view, BLOCKED_DEVICE_PREFIX, device).head(10),
+        'protocol_counts': rollup_counts(protocols, 'protocol'),
+    }
+
+def device_view(view, device):
+    if 'breakdown' not in view:
+        return approximate_device_view(view, device)
+    if device is None:
+        breakdown = view['breakdown']
+        blocked_breakdown = view['blocked_breakdown']
+        protocols = view['protocols']
+    else:
+        breakdown = view['breakdown'][view['breakdown']['device_name'] == device]
+        blocked_breakdown = breakdown[breakdown['is_blocked'] == 'Blocked']
+        protocols = view['protocols'][view['protocols']['device_name'] == device]
+    return {
+        'total': rollup_total(breakdown),
+        'blocked': rollup_total(blocked_breakdown),
+        'top_domains': rollup_counts(breakdown, 'root_domain').head(10),
+        'blocked_domains': rollup_counts(blocked_breakdown, 'root_domain').head(10),
+        'protocol_counts': rollup_counts(protocols, 'protocol'),
+    }
+
+def gafam_view(view):
+    all_tech_counts = view['tech_counts'] if 'tech_counts' in view else rollup_counts(view['breakdown'], 'all_tech')
+    gafam_time_series = (
+        view['local_timeline'].rename(columns={'bucket': 'time_bucket'})
+        .groupby(['time_bucket', 'gafam'], observed=True)['queries'].sum().reset_index(name='count')
+    )
+    return {
+        'gafam_counts': rollup_counts(view['timeline'], 'gafam'),
+        'other_tech_counts': all_tech_counts[~all_tech_counts.index.isin(COMPANIES + ['Others'])],
+        'gafam_time_series': gafam_time_series,
+        'company_domain_counts': (
+            view['company_domain_counts'] if 'company_domain_counts' in view
+            else split_by(rollup_counts(view['breakdown'], ['gafam', 'root_domain']), 'gafam')
+        ),
+    }
+
+def analytics_counts(rows, key):
+    return pd.Series([row.get('queries', 0) for row in rows], index=[row.get(key) or 'Unknown' for row in rows], dtype='int64')
+
+def combined_counts(series):
+    series = [counts for counts in series if len(counts)]
+    if not series:
+        return pd.Series(dtype='int64')
+    counts = pd.concat(series).groupby(level=0).sum()
+    return counts[counts > 0].sort_values(ascending=False, kind='stable')
+
+def summary_view(summaries):
+    status_counts = combined_counts(analytics_counts(summary['status'], 'status') for summary in summaries)
+    return {
+        'total_queries': int(status_counts.sum()),
+        'blocked_queries': int(status_counts.get('blocked', 0)),
+        'status_counts': status_counts,
+        'device_counts': combined_counts(analytics_counts(summary['devices'], 'name') for summary in summaries),
+        'allowed_domain_counts': combined_counts(
+            analytics_counts(summary[name], 'domain') for summary in summaries for name in ['default_domains', 'allowed_domains']
+        ).head(10),
+        'blocked_domain_counts': combined_counts(analytics_counts(summary['blocked_domains'], 'domain') for summary in summaries).head(10),
+    }
+
+def company_domain_counts(gafam, company):
+    return gafam['company_domain_counts'].get(company, pd.Series(dtype='int64'))
+
+def explorer_rows(df, search_term, status_filter, device_filter, search_index, offset=0):
+    mask = None
+    if search_term:
+        df = df.take(search_rows(search_index, search_term, offset, offset + len(df)) - offset)
+    if status_filter != 'All':
+        status_mask = (df['is_blocked'] == status_filter).to_numpy()
+        mask = status_mask if mask is None else mask & status_mask
+    if device_filter != 'All':
+        device_mask = (df['device_name'] == device_filter).to_numpy()
+        mask = device_mask if mask is None else mask & device_mask
+    return df if mask is None else df[mask]
+
+def explorer_page(df, order, page, page_size):
+    columns = [col for col in EXPLORER_COLUMNS if col in df.columns]
+    rows = order[(page - 1) * page_size:page * page_size]
+    return df.take(rows)[columns].rename(columns=EXPLORER_COLUMNS)
+
+def row_highlights(page):
+    styles = np.full(len(page), '', dtype=object)
+    if 'Protocol' in page.columns:
+        styles[page['Protocol'].isin(ENCRYPTED_PROTOCOLS).to_numpy()] = ENCRYPTED_STYLE
+    if 'Status' in page.columns:
+        styles[(page['Status'] == 'Blocked').to_numpy()] = BLOCKED_STYLE
+    return pd.DataFrame(np.repeat(styles[:, None], page.shape[1], axis=1), index=page.index, columns=page.columns)